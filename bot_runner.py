@@ -1,14 +1,18 @@
 # D:\hemis_ai\bot_runner.py
 
 import os
+import sys
+import atexit
+import signal
 import django
 import time
 import schedule
-import telebot
 from datetime import timedelta
+from functools import partial
+from itertools import islice
 from django.utils import timezone
 from threading import Thread
-from django.db.models import Count
+from django.db.models import Count, Exists, OuterRef
 from dotenv import load_dotenv
 
 # 1. ENV VA DJANGO MUHITINI SOZLASH
@@ -19,8 +23,12 @@ load_dotenv(ENV_PATH)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
-from core.models import User, EssayTopic, Attendance, Semester
-from core.services import get_auth_token
+from core.models import User, EssayTopic, Submission, Attendance, Semester, NotificationLog
+from core.notifications import (
+    claim_notifications, release_notification, mark_delivered, release_stale_claims, prune_notification_log,
+)
+from core.telegram_outbox import TelegramOutbox
+from core.telegram_bot import create_bot, webhook_url, webhook_secret, prune_updates
 
 # 2. BOT SOZLAMALARI
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -29,79 +37,29 @@ if not BOT_TOKEN:
     print("❌ XATOLIK: .env faylida TELEGRAM_BOT_TOKEN topilmadi!")
     exit(1)
 
-bot = telebot.TeleBot(BOT_TOKEN)
+# /start va boshqa handlerlar: core/telegram_bot.py
+bot = create_bot(BOT_TOKEN)
 
-# Foydalanuvchi ma'lumotlarini vaqtincha saqlash
-user_data = {}
+# Eslatmalar shu navbat orqali, Telegram limitlariga rioya qilgan holda yuboriladi
+outbox = TelegramOutbox(bot.send_message)
 
-# Qayta-qayta xabar yubormaslik uchun kesh (Set)
-sent_notifications = set()
+# To'xtash signalida navbatdagi xabarlar yuborilishi shuncha soniya kutiladi
+OUTBOX_SHUTDOWN_TIMEOUT = 20
 
-print("🤖 Hemis AI Bot ishga tushdi (Dual Notification & Attendance Control)...")
+# Shu holatdagi ish topshirilgan hisoblanadi - eslatma yuborilmaydi
+SUBMITTED_STATUSES = ['ai_graded', 'done', 'teacher_review']
 
-# --- BOT HANDLERS ---
-
-@bot.message_handler(commands=['start'])
-def send_welcome(message):
-    """1-QADAM: Start bosilganda Login so'raymiz"""
-    msg = bot.reply_to(message, 
-                 "Assalomu alaykum! Hemis AI botiga xush kelibsiz.\n\n"
-                 "🆔 Iltimos, **Hemis loginingizni** (ID raqam) yuboring:")
-    bot.register_next_step_handler(msg, process_login_step)
-
-def process_login_step(message):
-    """2-QADAM: Loginni qabul qilib, Parolni so'raymiz"""
-    try:
-        login_input = message.text.strip()
-        chat_id = message.chat.id
-        user_data[chat_id] = {'login': login_input}
-        
-        msg = bot.reply_to(message, f"✅ Login qabul qilindi: {login_input}\n\n🔑 Endi **Hemis parolingizni** yuboring:")
-        bot.register_next_step_handler(msg, process_password_step)
-    except Exception as e:
-        bot.reply_to(message, "Xatolik yuz berdi. Iltimos /start buyrug'ini qayta bosing.")
-
-def process_password_step(message):
-    """3-QADAM: Parolni olib, tekshiramiz"""
-    chat_id = message.chat.id
-    try:
-        password_input = message.text.strip()
-        step_data = user_data.get(chat_id)
-        
-        if not step_data or 'login' not in step_data:
-            bot.send_message(chat_id, "Jarayon buzildi. Iltimos /start ni qayta bosing.")
-            return
+# Qabul qiluvchilar bazadan shu o'lchamdagi bo'laklarda o'qiladi
+NOTIFY_CHUNK_SIZE = 2000
 
-        login_input = step_data['login']
-        
-        try:
-            bot.delete_message(chat_id, message.message_id)
-        except Exception:
-            pass 
+# Fan bo'yicha NB soni shunga yetganda ogohlantiriladi
+NB_THRESHOLD = 5
 
-        bot.send_message(chat_id, "⏳ Tekshirilmoqda... (Parolingiz xavfsizlik uchun o'chirildi)")
-        
-        auth_resp = get_auth_token(login_input, password_input)
-        
-        if auth_resp['success']:
-            try:
-                user = User.objects.get(username=login_input)
-                user.telegram_chat_id = str(chat_id)
-                user.save()
-                bot.send_message(chat_id, f"✅ Muvaffaqiyatli ulandiz, **{user.full_name}**!\n\n"
-                                          "Endi sizga:\n"
-                                          "1. Topshiriq muddati tugashiga 1 kun va 2 soat qolganda eslatma boradi.\n"
-                                          "2. NB (qoldirilgan darslar) 5 taga yetsa ogohlantirish boradi.")
-            except User.DoesNotExist:
-                bot.send_message(chat_id, "❌ Siz avval Hemis AI saytiga kirishingiz kerak.")
-        else:
-            bot.send_message(chat_id, "❌ Login yoki parol noto'g'ri. /start ni bosing.")
-        
-        if chat_id in user_data: del user_data[chat_id]
-            
-    except Exception as e:
-        bot.send_message(chat_id, f"Tizim xatoligi: {str(e)}")
-        if chat_id in user_data: del user_data[chat_id]
+print("🤖 Hemis AI Bot ishga tushdi (Dual Notification & Attendance Control)...")
+
+def connected_users():
+    """Telegram bot ulangan foydalanuvchilar."""
+    return User.objects.filter(telegram_chat_id__isnull=False).exclude(telegram_chat_id='')
 
 # --- CRON JOB 1: DEDLAYNLAR (1 kun va 2 soat oldin) ---
 
@@ -112,12 +70,7 @@ def check_deadlines():
     upcoming_topics = EssayTopic.objects.filter(
         deadline__gt=now,
         deadline__lte=now + timedelta(hours=25)
-    )
-    
-    if not upcoming_topics.exists():
-        return
-
-    connected_users = User.objects.filter(telegram_chat_id__isnull=False).exclude(telegram_chat_id='')
+    ).only('id', 'title', 'deadline')
 
     for topic in upcoming_topics:
         time_left = topic.deadline - now
@@ -135,26 +88,44 @@ def check_deadlines():
         if not notification_type:
             continue
 
-        for user in connected_users:
-            cache_key = f"{user.id}:{topic.id}:{notification_type}"
-            if cache_key in sent_notifications:
-                continue
-                
-            if user.submissions.filter(topic=topic, status__in=['ai_graded', 'done', 'teacher_review']).exists():
-                continue
+        msg = (f"{msg_header}\n\n"
+               f"📚 Mavzu: {topic.title}\n"
+               f"⏳ Aniq vaqt qoldi: {int(hours_left)} soat {int((hours_left % 1)*60)} daqiqa\n"
+               f"⏰ Muddat: {topic.deadline.strftime('%d.%m.%Y %H:%M')}\n\n"
+               f"Iltimos, ishingizni yuklang!")
+
+        key = f"topic_{topic.id}_{notification_type}"
+
+        # Qabul qiluvchilar bitta so'rovda: ulangan userlar minus ishini topshirganlar
+        # va bu eslatmani allaqachon olganlar
+        recipients = connected_users().filter(
+            ~Exists(Submission.objects.filter(
+                user=OuterRef('pk'), topic=topic, status__in=SUBMITTED_STATUSES
+            )),
+            ~Exists(NotificationLog.objects.filter(user=OuterRef('pk'), notification_key=key)),
+        ).values_list('id', 'telegram_chat_id')
 
-            try:
-                msg = (f"{msg_header}\n\n"
-                       f"📚 Mavzu: {topic.title}\n"
-                       f"⏳ Aniq vaqt qoldi: {int(hours_left)} soat {int((hours_left % 1)*60)} daqiqa\n"
-                       f"⏰ Muddat: {topic.deadline.strftime('%d.%m.%Y %H:%M')}\n\n"
-                       f"Iltimos, ishingizni yuklang!")
-                
-                bot.send_message(user.telegram_chat_id, msg)
-                print(f"   -> Xabar ({notification_type}) yuborildi: {user.full_name}")
-                sent_notifications.add(cache_key)
-            except Exception as e:
-                print(f"   -> Xatolik ({user.username}): {e}")
+        queued = 0
+        rows = recipients.iterator(chunk_size=NOTIFY_CHUNK_SIZE)
+        while chunk := list(islice(rows, NOTIFY_CHUNK_SIZE)):
+            # Yuborishdan oldin band qilamiz - parallel bot jarayoni shu xabarni yubormaydi
+            claimed = claim_notifications((row[0], key) for row in chunk)
+
+            for user_id, chat_id in chunk:
+                if (user_id, key) not in claimed:
+                    continue
+                # Vaqtinchalik xatoda band bekor qilinadi - keyingi tekshiruvda qayta urinadi.
+                # Telegram rad etsa (bot bloklangan va h.k.) qayta yuborilmaydi
+                outbox.submit(
+                    chat_id, msg,
+                    on_failure=partial(release_notification, user_id, key),
+                    on_success=partial(mark_delivered, user_id, key),
+                    on_rejected=partial(mark_delivered, user_id, key),
+                )
+                queued += 1
+
+        if queued:
+            print(f"   -> {topic.title}: {queued} ta eslatma ({notification_type}) navbatga qo'yildi")
 
 # --- CRON JOB 2: DAVOMAT (NB) NAZORATI ---
 
@@ -165,49 +136,105 @@ def check_attendance():
     if not current_sem:
         return
 
-    connected_users = User.objects.filter(telegram_chat_id__isnull=False).exclude(telegram_chat_id='')
+    # Barcha ulangan userlar bo'yicha bitta guruhlangan so'rov: (user, fan) -> NB soni >= chegara
+    subject_stats = (
+        Attendance.objects.filter(
+            semester=current_sem,
+            user__telegram_chat_id__isnull=False,
+        )
+        .exclude(user__telegram_chat_id='')
+        .values_list(
+            'user_id', 'user__full_name', 'user__telegram_chat_id',
+            'subject_id', 'subject__name',
+        )
+        .annotate(nb_count=Count('id'))
+        .filter(nb_count__gte=NB_THRESHOLD)
+        .order_by()
+    )
 
-    for user in connected_users:
-        subject_stats = Attendance.objects.filter(
-            user=user, 
-            semester=current_sem
-        ).values('subject__name', 'subject__id').annotate(nb_count=Count('id'))
-        
-        for stat in subject_stats:
-            nb_count = stat['nb_count']
-            subj_name = stat['subject__name']
-            subj_id = stat['subject__id']
-            
-            if nb_count >= 5:
-                cache_key = f"{user.id}:{subj_id}:nb_{nb_count}"
-                
-                if cache_key not in sent_notifications:
-                    try:
-                        msg = (f"⚠️ MUHIM OGOHLANTIRISH!\n\n"
-                               f"Hurmatli {user.full_name},\n"
-                               f"Sizning **'{subj_name}'** fanidan qoldirilgan darslaringiz (NB) soni **{nb_count}** taga yetdi!\n\n"
-                               f"Iltimos, darslarga qatnashing yoki sababli hujjatlarni taqdim qiling.\n"
-                               f"Aks holda yakuniy imtihonga kiritilmasligingiz mumkin.")
-                        
-                        bot.send_message(user.telegram_chat_id, msg)
-                        print(f"   -> NB Ogohlantirish ({nb_count}): {user.full_name} -> {subj_name}")
-                        sent_notifications.add(cache_key)
-                    except Exception as e:
-                        print(f"   -> Xatolik NB ({user.username}): {e}")
+    queued = 0
+    rows = subject_stats.iterator(chunk_size=NOTIFY_CHUNK_SIZE)
+    while chunk := list(islice(rows, NOTIFY_CHUNK_SIZE)):
+        # Shu son uchun ogohlantirish yuborilmaganlarini band qilamiz (bo'lak uchun bitta INSERT)
+        claimed = claim_notifications((row[0], f"subject_{row[3]}_nb_{row[5]}") for row in chunk)
+
+        for user_id, full_name, chat_id, subj_id, subj_name, nb_count in chunk:
+            key = f"subject_{subj_id}_nb_{nb_count}"
+            if (user_id, key) not in claimed:
+                continue
+
+            msg = (f"⚠️ MUHIM OGOHLANTIRISH!\n\n"
+                   f"Hurmatli {full_name},\n"
+                   f"Sizning **'{subj_name}'** fanidan qoldirilgan darslaringiz (NB) soni **{nb_count}** taga yetdi!\n\n"
+                   f"Iltimos, darslarga qatnashing yoki sababli hujjatlarni taqdim qiling.\n"
+                   f"Aks holda yakuniy imtihonga kiritilmasligingiz mumkin.")
+            outbox.submit(
+                chat_id, msg,
+                on_failure=partial(release_notification, user_id, key),
+                on_success=partial(mark_delivered, user_id, key),
+                on_rejected=partial(mark_delivered, user_id, key),
+            )
+            queued += 1
+
+    if queued:
+        print(f"   -> {queued} ta NB ogohlantirish navbatga qo'yildi")
+
+# --- CRON JOB 3: ESKI BILDIRISHNOMALAR TARIXINI TOZALASH ---
+
+def prune_notifications():
+    deleted = prune_notification_log() + prune_updates()
+    print(f"🧹 [{timezone.now().strftime('%H:%M:%S')}] Bot tarixidan {deleted} ta eski yozuv o'chirildi")
+
+def release_stale_notifications():
+    # Yuborishdan oldin to'xtagan (masalan, kill -9) jarayonning bandlari - eslatmalar qayta yuboriladi
+    released = release_stale_claims()
+    if released:
+        print(f"♻️ [{timezone.now().strftime('%H:%M:%S')}] {released} ta yetkazilmagan eslatma bandi bekor qilindi")
+
+def report_outbox():
+    stats = outbox.stats()
+    if stats.get('queued'):
+        print(f"📨 Xabarlar navbati: {stats}")
 
 # Har soatda tekshirish
+schedule.every().hour.do(release_stale_notifications)
 schedule.every().hour.do(check_deadlines)
 schedule.every().hour.do(check_attendance)
+schedule.every().day.do(prune_notifications)
+schedule.every(10).minutes.do(report_outbox)
 
 # --- RUNNER ---
 
+def shutdown_outbox():
+    """Jarayon tugashida navbatdagi xabarlarni yuborib ulgurishga harakat qiladi, qolganlarining bandini bekor qiladi."""
+    dropped = outbox.shutdown(OUTBOX_SHUTDOWN_TIMEOUT)
+    if dropped:
+        print(f"🛑 {dropped} ta eslatma yuborilmadi - keyingi ishga tushishda qayta yuboriladi")
+
+def handle_stop_signal(signum, frame):
+    # SystemExit -> atexit dagi shutdown_outbox() ishlaydi
+    sys.exit(0)
+
 def run_schedule():
     while True:
         schedule.run_pending()
-        time.sleep(60)
+        # Keyingi vazifagacha uxlaymiz (har daqiqada uyg'onib tekshirmasdan)
+        idle = schedule.idle_seconds()
+        time.sleep(60 if idle is None else min(max(idle, 1), 3600))
 
-if __name__ == "__main__":
-    t = Thread(target=run_schedule)
+def run_webhook():
+    """Yangilanishlarni Telegram Django ga yuboradi (/telegram/webhook/), bu jarayon faqat eslatmalarni yuboradi."""
+    if not webhook_secret():
+        print("❌ XATOLIK: TELEGRAM_WEBHOOK_URL bilan birga TELEGRAM_WEBHOOK_SECRET ham berilishi kerak!")
+        exit(1)
+    bot.set_webhook(url=webhook_url(), secret_token=webhook_secret(), allowed_updates=['message'])
+    print(f"🌐 Webhook rejimi: {webhook_url()}")
+    run_schedule()
+
+def run_polling():
+    # Avval o'rnatilgan webhook bo'lsa polling ishlamaydi
+    bot.remove_webhook()
+    t = Thread(target=run_schedule, daemon=True)
     t.start()
     
     print("🚀 Bot ishga tushdi va aloqa kuzatilmoqda...")
@@ -218,4 +245,13 @@ if __name__ == "__main__":
             bot.infinity_polling(timeout=60, long_polling_timeout=60)
         except Exception as e:
             print(f"⚠️ Bot aloqasi uzildi ({str(e)}). 5 soniyadan keyin qayta ulanadi...")
-            time.sleep(5)
\ No newline at end of file
+            time.sleep(5)
+
+if __name__ == "__main__":
+    atexit.register(shutdown_outbox)
+    signal.signal(signal.SIGTERM, handle_stop_signal)
+    release_stale_notifications()
+    if webhook_url():
+        run_webhook()
+    else:
+        run_polling()
\ No newline at end of file
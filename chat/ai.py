@@ -1,5 +1,9 @@
+import asyncio
 import os
+import threading
+import time
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from dotenv import load_dotenv
 
 # .env yuklash (agar kerak bo'lsa)
@@ -27,27 +31,171 @@ def get_api_key(agent_type):
     # Agar maxsus kalit bo'lmasa, STUDENT kalitini yoki eng asosiysini qaytaradi
     return keys.get(agent_type) or keys.get(AGENT_STUDENT)
 
+# Bizga kerakli modellar ketma-ketligi (ustuvorlik bo'yicha)
+MODEL_PRIORITY = [
+    'models/gemini-1.5-flash',
+    'models/gemini-1.5-pro',
+    'models/gemini-pro',
+    'gemini-1.5-flash',
+    'gemini-pro'
+]
+DEFAULT_MODEL = 'gemini-pro'
+MODEL_CACHE_TTL = int(os.getenv('GEMINI_MODEL_CACHE_TTL', 60 * 60))
+MODEL_RETRY_TTL = 60  # list_models ishlamasa, shuncha soniyadan keyin qayta uriniladi
+
+# Jarayon bo'yicha umumiy kesh: har bir chat so'rovida list_models() chaqirilmaydi
+_model_lock = threading.Lock()
+_discover_lock = threading.Lock()
+_model_cache = {'name': None, 'expires': 0.0, 'refreshing': False}
+
+
+def _discover_model():
+    """Mavjud modellarni tekshirib, eng yaxshisini qaytaradi (tarmoq so'rovi)."""
+    # Tizimdagi barcha modellarni olamiz
+    client = _get_clients(get_api_key(AGENT_GENERAL))['model']
+    available_models = [m.name for m in genai.list_models(client=client) if 'generateContent' in m.supported_generation_methods]
+
+    for model in MODEL_PRIORITY:
+        if model in available_models:
+            return model
+
+    # Agar ro'yxatdan topilmasa, birinchisini yoki standartni qaytaradi
+    return available_models[0] if available_models else DEFAULT_MODEL
+
+
+def _refresh_model():
+    try:
+        name, ttl = _discover_model(), MODEL_CACHE_TTL
+    except Exception:
+        # Eski qiymat (bo'lsa) saqlanib qoladi, biroz kutib qayta urinamiz
+        name, ttl = None, MODEL_RETRY_TTL
+    with _model_lock:
+        if name:
+            _model_cache['name'] = name
+        _model_cache['expires'] = time.monotonic() + ttl
+        _model_cache['refreshing'] = False
+    return name
+
+
 def get_available_model():
-    """Mavjud modellarni tekshirib, eng yaxshisini qaytaradi."""
+    """
+    Ishlatiladigan model nomini qaytaradi.
+    GEMINI_MODEL berilgan bo'lsa - o'sha, aks holda keshdagi topilgan model.
+    Kesh eskirsa eski nom darhol qaytariladi va fonda yangilanadi.
+    """
+    override = os.getenv('GEMINI_MODEL')
+    if override:
+        return override
+
+    with _model_lock:
+        name = _model_cache['name']
+        expired = time.monotonic() >= _model_cache['expires']
+        refresh_in_background = bool(name) and expired and not _model_cache['refreshing']
+        if refresh_in_background:
+            _model_cache['refreshing'] = True
+
+    if name:
+        if refresh_in_background:
+            threading.Thread(target=_refresh_model, daemon=True).start()
+        return name
+    if not expired:
+        # Yaqinda urinib ko'rildi va ishlamadi
+        return DEFAULT_MODEL
+
+    # Birinchi chaqiruv: faqat bitta oqim tarmoqqa chiqadi, qolganlari natijani kutadi
+    with _discover_lock:
+        with _model_lock:
+            name = _model_cache['name']
+            expired = time.monotonic() >= _model_cache['expires']
+        if name or not expired:
+            return name or DEFAULT_MODEL
+        return _refresh_model() or DEFAULT_MODEL
+
+
+# --- Klientlar reestri ---
+# genai.configure() global holat: turli agent kalitlari bilan parallel so'rovlar
+# bir-birining kalitini almashtirib yuborishi mumkin edi. Endi har bir kalit uchun
+# alohida klient, har bir (kalit, model) uchun esa bitta GenerativeModel yaratilib,
+# jarayon davomida qayta ishlatiladi.
+_registry_lock = threading.RLock()
+_clients = {}  # api_key -> {'generative': ..., 'model': ...}
+_models = {}  # (api_key, model_name) -> GenerativeModel
+# grpc.aio kanali o'zi yaratilgan event loop ga bog'liq - async klient va
+# modellar har bir loop uchun alohida. ASGI da loop bitta; WSGI ostida esa har
+# so'rov yangi loop ochadi, shuning uchun yopilgan loop lar yozuvi o'chiriladi.
+_loop_registry = {}  # loop -> {'clients': {...}, 'models': {...}}
+
+
+def _get_clients(api_key):
+    if not api_key:
+        raise ValueError("API kalit topilmadi")
+    clients = _clients.get(api_key)
+    if clients is None:
+        with _registry_lock:
+            clients = _clients.get(api_key)
+            if clients is None:
+                options = {'api_key': api_key}
+                clients = {
+                    'generative': glm.GenerativeServiceClient(client_options=options),
+                    'model': glm.ModelServiceClient(client_options=options),
+                }
+                _clients[api_key] = clients
+    return clients
+
+
+def _running_loop():
     try:
-        # Tizimdagi barcha modellarni olamiz
-        available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        
-        # Bizga kerakli modellar ketma-ketligi (ustuvorlik bo'yicha)
-        priority_list = [
-            'models/gemini-1.5-flash',
-            'models/gemini-1.5-pro',
-            'models/gemini-pro',
-            'gemini-1.5-flash',
-            'gemini-pro'
-        ]
-        
-        for model in priority_list:
-            if model in available_models:
-                return model
-                
-        # Agar ro'yxatdan topilmasa, birinchisini yoki standartni qaytaradi
-        return available_models[0] if available_models else 'gemini-pro'
-    except:
-        # Agar list_models ishlamasa, eng ishonchli variantni qaytaradi
-        return 'gemini-pro'
\ No newline at end of file
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_model(agent_type, model_name=None):
+    """
+    Agent kaliti bilan sozlangan GenerativeModel ni qaytaradi (kalit bo'lmasa - None).
+    model_name berilmasa get_available_model() tanlaydi.
+    Event loop ichida chaqirilsa, model shu loop ning async klientini ham oladi
+    (generate_content_async uchun).
+    """
+    api_key = get_api_key(agent_type)
+    if not api_key:
+        return None
+    model_name = model_name or get_available_model()
+
+    key = (api_key, model_name)
+    loop = _running_loop()
+    with _registry_lock:
+        if loop is None:
+            models, async_clients = _models, None
+        else:
+            entry = _loop_registry.get(loop)
+            if entry is None:
+                for closed in [l for l in _loop_registry if l.is_closed()]:
+                    del _loop_registry[closed]
+                entry = _loop_registry[loop] = {'clients': {}, 'models': {}}
+            models, async_clients = entry['models'], entry['clients']
+
+        model = models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            # Global default klient o'rniga shu kalitning klienti ishlatiladi
+            model._client = _get_clients(api_key)['generative']
+            if async_clients is not None:
+                if api_key not in async_clients:
+                    async_clients[api_key] = glm.GenerativeServiceAsyncClient(client_options={'api_key': api_key})
+                model._async_client = async_clients[api_key]
+            models[key] = model
+    return model
+
+
+async def stream_text(model, prompt):
+    """generate_content_async(stream=True) javobining matn bo'laklarini kelishi bilan qaytaradi."""
+    response = await model.generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Matnsiz bo'lak (masalan, xavfsizlik filtri to'xtatgan)
+            continue
+        if text:
+            yield text
\ No newline at end of file
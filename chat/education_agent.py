@@ -1,25 +1,10 @@
-import google.generativeai as genai
-from .ai import get_api_key, get_available_model, AGENT_EDUCATION
+from asgiref.sync import sync_to_async
 
-def ask_education_ai(user_message):
-    """
-    Faqat ta'limga oid savollarga javob beruvchi maxsus AI agenti.
-    GEMINI_KEY_EDUCATION kalitidan foydalanadi.
-    """
-    # 1. Maxsus Education API Kalitni olish
-    api_key = get_api_key(AGENT_EDUCATION)
-    
-    if not api_key:
-        return "Tizim xatoligi: Education API kalit topilmadi (.env faylni tekshiring)."
+from .ai import get_api_key, get_available_model, get_model, stream_text, AGENT_EDUCATION
+from .response_cache import response_cache
 
-    try:
-        # 2. Sozlash
-        genai.configure(api_key=api_key)
-        model_name = get_available_model()
-        model = genai.GenerativeModel(model_name)
-
-        # 3. QAT'IY YO'RIQNOMA (System Prompt)
-        system_instruction = """
+# QAT'IY YO'RIQNOMA (System Prompt)
+SYSTEM_INSTRUCTION = """
         Sen "Education Support AI"san - Ta'lim bo'yicha maxsus yordamchisan.
         
         VAZIFANG:
@@ -41,11 +26,60 @@ def ask_education_ai(user_message):
         - Aniq, ilmiy va tushunarli bo'lsin.
         """
 
-        full_prompt = f"{system_instruction}\n\nFOYDALANUVCHI SAVOLI: {user_message}"
+def _prompt(user_message):
+    return f"{SYSTEM_INSTRUCTION}\n\nFOYDALANUVCHI SAVOLI: {user_message}"
+
+async def ask_education_ai(user_message):
+    """
+    Faqat ta'limga oid savollarga javob beruvchi maxsus AI agenti.
+    GEMINI_KEY_EDUCATION kalitidan foydalanadi.
+    """
+    # 1. Maxsus Education API Kalitni olish
+    api_key = get_api_key(AGENT_EDUCATION)
+    
+    if not api_key:
+        return "Tizim xatoligi: Education API kalit topilmadi (.env faylni tekshiring)."
+
+    # Shu (yoki juda o'xshash) savolga javob keshda bo'lsa - Gemini ga so'rov yuborilmaydi
+    cached = response_cache.get(AGENT_EDUCATION, user_message)
+    if cached is not None:
+        return cached
+
+    try:
+        # 2. Sozlash
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_EDUCATION, model_name)
 
-        # 4. Javob olish
-        response = model.generate_content(full_prompt)
+        # 3. Javob olish (async - kutish paytida worker oqimi band bo'lmaydi)
+        response = await model.generate_content_async(_prompt(user_message))
+        response_cache.set(AGENT_EDUCATION, user_message, response.text)
         return response.text
 
     except Exception as e:
-        return f"Education AI xatosi: {str(e)}"
\ No newline at end of file
+        return f"Education AI xatosi: {str(e)}"
+
+async def stream_education_ai(user_message):
+    """ask_education_ai ning oqimli (stream) varianti - javob bo'laklari kelishi bilan qaytariladi."""
+    api_key = get_api_key(AGENT_EDUCATION)
+    
+    if not api_key:
+        yield "Tizim xatoligi: Education API kalit topilmadi (.env faylni tekshiring)."
+        return
+
+    cached = response_cache.get(AGENT_EDUCATION, user_message)
+    if cached is not None:
+        yield cached
+        return
+
+    model_name = '?'
+    try:
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_EDUCATION, model_name)
+        parts = []
+        async for text in stream_text(model, _prompt(user_message)):
+            parts.append(text)
+            yield text
+        # Faqat to'liq (xatosiz) javob keshga yoziladi
+        response_cache.set(AGENT_EDUCATION, user_message, ''.join(parts))
+    except Exception as e:
+        yield f"Education AI xatosi: {str(e)}"
\ No newline at end of file
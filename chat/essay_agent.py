@@ -1,20 +1,23 @@
 # chat/essay_agent.py
 
+import asyncio
 import os
-import google.generativeai as genai
 import json
 from dotenv import load_dotenv
 import pathlib
 from PIL import Image
-import time
+from asgiref.sync import sync_to_async
+
+from .ai import get_api_key, get_model, AGENT_ESSAY
 
 CURRENT_DIR = pathlib.Path(__file__).resolve().parent
 BASE_DIR = CURRENT_DIR.parent
 ENV_PATH = BASE_DIR / '.env'
 load_dotenv(ENV_PATH)
 
-def grade_essay_ai(topic_title, topic_desc, topic_file_path=None, student_text=None, student_file_path=None):
-    api_key = os.getenv('GEMINI_KEY_ESSAY') or os.getenv('GEMINI_KEY_STUDENT')
+async def grade_essay_ai(topic_title, topic_desc, topic_file_path=None, student_text=None, student_file_path=None):
+    """Async: Gemini javobini kutish paytida worker oqimi band bo'lmaydi."""
+    api_key = get_api_key(AGENT_ESSAY)
     
     if not api_key:
         return 0, "Tizim xatoligi: API kalit topilmadi."
@@ -26,8 +29,6 @@ def grade_essay_ai(topic_title, topic_desc, topic_file_path=None, student_text=N
         'gemini-2.0-flash-lite',
     ]
 
-    genai.configure(api_key=api_key)
-
     base_prompt = f"""
     Sen Oliy Ta'lim muassasasining o'qituvchisisan.
     
@@ -47,36 +48,19 @@ def grade_essay_ai(topic_title, topic_desc, topic_file_path=None, student_text=N
     }}
     """
 
-    content_parts = [base_prompt]
-
-    if topic_file_path:
-        try:
-            img = Image.open(topic_file_path)
-            content_parts.append("---O'QITUVCHI BERGAN SAVOL (RASM)---")
-            content_parts.append(img)
-        except: pass 
-
-    content_parts.append("---TALABA JAVOBI---")
-    
-    if student_file_path:
-        try:
-            img = Image.open(student_file_path)
-            content_parts.append("(Talaba javobni rasmda yukladi):")
-            content_parts.append(img)
-        except:
-            content_parts.append("(Talaba fayl yukladi, lekin tizim ocha olmadi).")
-    
-    if student_text:
-        content_parts.append(f"(Talaba matn yozdi): {student_text}")
+    # Rasmlarni ochish (disk I/O) event loop dan tashqarida
+    content_parts = await sync_to_async(_content_parts, thread_sensitive=False)(
+        base_prompt, topic_file_path, student_text, student_file_path
+    )
 
     last_error = ""
     
     for model_name in MODELS_TO_TRY:
         try:
             print(f"🔄 AI urinmoqda: {model_name}...")
-            model = genai.GenerativeModel(model_name)
+            model = get_model(AGENT_ESSAY, model_name)
             
-            response = model.generate_content(content_parts)
+            response = await model.generate_content_async(content_parts)
             
             text_resp = response.text
             if not text_resp: raise ValueError("Bo'sh javob keldi")
@@ -96,7 +80,35 @@ def grade_essay_ai(topic_title, topic_desc, topic_file_path=None, student_text=N
         except Exception as e:
             print(f"❌ {model_name} xatosi: {e}")
             last_error = str(e)
-            time.sleep(1)
+            await asyncio.sleep(1)
             continue
 
-    return 0, f"Texnik xatolik: AI modellari javob bermadi. ({last_error})"
\ No newline at end of file
+    return 0, f"Texnik xatolik: AI modellari javob bermadi. ({last_error})"
+
+def _content_parts(base_prompt, topic_file_path, student_text, student_file_path):
+    # Image.open dangasa - load() faylni shu (sync) oqimda o'qib qo'yadi
+    content_parts = [base_prompt]
+
+    if topic_file_path:
+        try:
+            img = Image.open(topic_file_path)
+            img.load()
+            content_parts.append("---O'QITUVCHI BERGAN SAVOL (RASM)---")
+            content_parts.append(img)
+        except: pass 
+
+    content_parts.append("---TALABA JAVOBI---")
+    
+    if student_file_path:
+        try:
+            img = Image.open(student_file_path)
+            img.load()
+            content_parts.append("(Talaba javobni rasmda yukladi):")
+            content_parts.append(img)
+        except:
+            content_parts.append("(Talaba fayl yukladi, lekin tizim ocha olmadi).")
+    
+    if student_text:
+        content_parts.append(f"(Talaba matn yozdi): {student_text}")
+
+    return content_parts
\ No newline at end of file
@@ -1,14 +1,16 @@
 import os
-import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Q, Min, Max
-from core.models import Schedule, Attendance, Task, Semester, User, Week
+from django.core.cache import cache
+from django.db.models import Sum, Q
+from core.models import Schedule, Attendance, Task, User
+from core.lookups import semesters, weeks
 from dotenv import load_dotenv
 import pathlib
 
 # Markaziy utilitlardan import qilamiz
-from .ai import get_api_key, get_available_model, AGENT_STUDENT
+from .ai import get_api_key, get_available_model, get_model, stream_text, AGENT_STUDENT
 
 # .env yuklash
 CURRENT_DIR = pathlib.Path(__file__).resolve().parent
@@ -18,9 +20,12 @@ load_dotenv(ENV_PATH)
 
 # DIPPAT: get_best_model funksiyasi O'CHIRILDI, o'rniga ai.py dagi ishlatiladi.
 
+DAYS_ORDER = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
+CONTEXT_CACHE_TTL = 24 * 60 * 60
+
+
 def get_hemis_context(user: User):
     """Talabaning to'liq akademik tarixi va jadvali bo'yicha kontekst yaratadi."""
-    # ... (Bu funksiyaning ichki kodi o'zgarishsiz qoladi, chunki u mukammal ishlaydi)
     now = timezone.now()
     today_str = now.strftime("%d.%m.%Y (%A)")
     
@@ -41,27 +46,53 @@ def get_hemis_context(user: User):
     - Manzil: {address_info}
     - Tug'ilgan sana: {birth_info}
     """
-    context += "\n--- O'QISH DAVRLARI VA JADVALLAR ---\n"
-    
-    sem_ids = Schedule.objects.filter(user=user).values_list('semester', flat=True)
-    unique_sem_ids = list(set(sem_ids))
-    sched_semesters = Semester.objects.filter(id__in=unique_sem_ids).order_by('-code')
-    
-    days_order = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
-    
-    if sched_semesters.exists():
+    # Sana va profil har safar yangidan, bazadan olinadigan qism esa keshdan.
+    # Sync talabaning ma'lumotini yoki umumiy semestr/hafta jadvallarini (nomi,
+    # joriy semestr, sanalar) o'zgartirsa, bazadagi versiya oshadi va kontekst qayta quriladi.
+    key = f"hemis:context:{user.id}:{user.hemis_data_version}:{semesters.version()}:{weeks.version()}"
+    academic = cache.get(key)
+    if academic is None:
+        academic = _build_academic_context(user)
+        cache.set(key, academic, CONTEXT_CACHE_TTL)
+    return context + academic
+
+
+def _build_academic_context(user):
+    """Jadval, davomat va baholar qismi - uchta guruhlangan so'rov bilan."""
+    all_semesters = sorted(semesters.all(), key=lambda s: s.code)
+    context = "\n--- O'QISH DAVRLARI VA JADVALLAR ---\n"
+
+    # semestr -> {'weeks': set, 'days': {kun: {vaqt: [yozuvlar]}}}
+    by_semester = {}
+    day_names = {day.lower(): day for day in DAYS_ORDER}
+    lessons = Schedule.objects.filter(user=user).order_by('lesson_time').values_list(
+        'semester_id', 'week_id', 'day_name', 'lesson_time', 'teacher', 'room', 'subject__name'
+    )
+    for sem_id, week_id, day_name, lesson_time, teacher, room, subject_name in lessons:
+        sem_data = by_semester.setdefault(sem_id, {'weeks': set(), 'days': {}})
+        sem_data['weeks'].add(week_id)
+        day = day_names.get((day_name or '').lower())
+        if day is None:
+            continue
+
+        teacher_str = teacher if teacher else "Noma'lum"
+        subject_entry = f"Fan: {subject_name} || Xona: {room} || O'qituvchi: {teacher_str}"
+        time_map = sem_data['days'].setdefault(day, {}).setdefault(lesson_time, [])
+        if subject_entry not in time_map:
+            time_map.append(subject_entry)
+
+    sched_semesters = [s for s in reversed(all_semesters) if s.id in by_semester]
+    if sched_semesters:
         for sem in sched_semesters:
-            related_schedules = Schedule.objects.filter(user=user, semester=sem)
-            week_ids = related_schedules.values_list('week_id', flat=True)
-            
+            sem_data = by_semester[sem.id]
+
             # Semestr sanalarini aniqlash
-            date_range = Week.objects.filter(week_id__in=list(set(week_ids))).aggregate(
-                start=Min('start_date'),
-                end=Max('end_date')
-            )
+            sem_weeks = weeks.get_many(sem_data['weeks']).values()
+            range_start = min((w.start_date for w in sem_weeks), default=None)
+            range_end = max((w.end_date for w in sem_weeks), default=None)
             
-            start_date = date_range['start'].strftime('%d.%m.%Y') if date_range['start'] else "Noma'lum"
-            end_date = date_range['end'].strftime('%d.%m.%Y') if date_range['end'] else "Noma'lum"
+            start_date = range_start.strftime('%d.%m.%Y') if range_start else "Noma'lum"
+            end_date = range_end.strftime('%d.%m.%Y') if range_end else "Noma'lum"
             
             sem_header = f"{sem.name} (Davri: {start_date} dan {end_date} gacha)"
             if sem.current: sem_header += " [JORIY SEMESTR]"
@@ -69,27 +100,15 @@ def get_hemis_context(user: User):
             context += f"\n>>> {sem_header}:\n"
             
             has_lesson = False
-            for day in days_order:
-                lessons = related_schedules.filter(day_name__iexact=day).order_by('lesson_time')
-                
-                if lessons.exists():
-                    has_lesson = True
-                    context += f"  {day}:\n"
-                    
-                    time_map = {} 
-                    for s in lessons:
-                        time_key = s.lesson_time
-                        if time_key not in time_map: time_map[time_key] = []
-                        
-                        teacher_str = s.teacher if s.teacher else "Noma'lum"
-                        subject_entry = f"Fan: {s.subject.name} || Xona: {s.room} || O'qituvchi: {teacher_str}"
-                        
-                        if subject_entry not in time_map[time_key]: 
-                            time_map[time_key].append(subject_entry)
-                    
-                    for time, subjects in time_map.items():
-                        subjects_str = " / ".join(subjects)
-                        context += f"    - {time} | {subjects_str}\n"
+            for day in DAYS_ORDER:
+                time_map = sem_data['days'].get(day)
+                if not time_map:
+                    continue
+                has_lesson = True
+                context += f"  {day}:\n"
+                for time, subjects in time_map.items():
+                    subjects_str = " / ".join(subjects)
+                    context += f"    - {time} | {subjects_str}\n"
 
             if not has_lesson:
                 context += "  (Bu semestr uchun jadval yo'q)\n"
@@ -97,19 +116,25 @@ def get_hemis_context(user: User):
         context += "Jadval ma'lumotlari topilmadi.\n"
 
     context += "\n--- DAVOMAT STATISTIKASI ---\n"
-    all_semesters = Semester.objects.all().order_by('code')
-    for sem in all_semesters:
-        stats = Attendance.objects.filter(user=user, semester=sem).aggregate(
+    att_stats = {
+        row['semester']: row
+        for row in Attendance.objects.filter(user=user).order_by().values('semester').annotate(
             total=Sum('hours'),
             sababli=Sum('hours', filter=Q(type__icontains='Sababli')),
             sababsiz=Sum('hours', filter=Q(type__icontains='Sababsiz'))
         )
-        if stats['total'] and stats['total'] > 0:
+    }
+    for sem in all_semesters:
+        stats = att_stats.get(sem.id)
+        if stats and stats['total'] and stats['total'] > 0:
             context += f"{sem.name}: Jami {stats['total']} soat (Sababli: {stats['sababli'] or 0}, Sababsiz: {stats['sababsiz'] or 0})\n"
 
     context += "\n--- SO'NGGI BAHOLAR ---\n"
-    tasks = Task.objects.filter(user=user).exclude(grade_val=0).order_by('-semester__code', '-id')[:20]
-    if tasks.exists():
+    tasks = list(
+        Task.objects.filter(user=user).exclude(grade_val=0)
+        .select_related('semester', 'subject').order_by('-semester__code', '-id')[:20]
+    )
+    if tasks:
         for t in tasks:
             context += f"{t.semester.name}: {t.subject.name} - {t.grade} ball ({t.name})\n"
     else:
@@ -117,27 +142,11 @@ def get_hemis_context(user: User):
 
     return context
 
-def ask_hemis_ai(user, user_message):
-    """
-    Hemis AI ning asosiy interfeysi.
-    Faqat Hemis ma'lumotlariga asoslangan javob qaytaradi.
-    """
-    # 1. API Kalitni olish (Markaziy funksiyadan)
-    api_key = get_api_key(AGENT_STUDENT)
+def _hemis_prompt(user, user_message):
+    context_data = get_hemis_context(user)
     
-    if not api_key: return "Tizim xatoligi: API kalit topilmadi."
-
-    try:
-        genai.configure(api_key=api_key)
-        
-        # 2. Model tanlash (Markaziy funksiyadan)
-        model_name = get_available_model()
-        model = genai.GenerativeModel(model_name)
-        
-        context_data = get_hemis_context(user)
-        
-        # --- QAT'IY YO'RIQNOMA (PROMPT) ---
-        system_instruction = f"""
+    # --- QAT'IY YO'RIQNOMA (PROMPT) ---
+    system_instruction = f"""
         Sen "Hemis AI"san - talabaning shaxsiy akademik assistenti.
         
         CONTEXT (MA'LUMOTLAR):
@@ -157,9 +166,47 @@ def ask_hemis_ai(user, user_message):
         
         6. O'zbek tilida, samimiy va aniq javob ber.
         """
+    
+    return f"{system_instruction}\n\nSAVOL: {user_message}"
+
+async def ask_hemis_ai(user, user_message):
+    """
+    Hemis AI ning asosiy interfeysi.
+    Faqat Hemis ma'lumotlariga asoslangan javob qaytaradi.
+    Gemini so'rovi async - kutish paytida worker oqimi band bo'lmaydi.
+    """
+    # 1. API Kalitni olish (Markaziy funksiyadan)
+    api_key = get_api_key(AGENT_STUDENT)
+    
+    if not api_key: return "Tizim xatoligi: API kalit topilmadi."
+
+    try:
+        # 2. Model tanlash (Markaziy funksiyadan)
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_STUDENT, model_name)
         
-        response = model.generate_content(f"{system_instruction}\n\nSAVOL: {user_message}")
+        # Kontekst bazadan (yoki keshdan) olinadi - ORM faqat sync oqimda
+        prompt = await sync_to_async(_hemis_prompt)(user, user_message)
+        response = await model.generate_content_async(prompt)
         return response.text
 
     except Exception as e:
-        return f"Xatolik ({model_name if 'model_name' in locals() else '?'}) {str(e)}"
\ No newline at end of file
+        return f"Xatolik ({model_name if 'model_name' in locals() else '?'}) {str(e)}"
+
+async def stream_hemis_ai(user, user_message):
+    """ask_hemis_ai ning oqimli (stream) varianti - javob bo'laklari kelishi bilan qaytariladi."""
+    api_key = get_api_key(AGENT_STUDENT)
+    
+    if not api_key:
+        yield "Tizim xatoligi: API kalit topilmadi."
+        return
+
+    model_name = '?'
+    try:
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_STUDENT, model_name)
+        prompt = await sync_to_async(_hemis_prompt)(user, user_message)
+        async for text in stream_text(model, prompt):
+            yield text
+    except Exception as e:
+        yield f"Xatolik ({model_name}) {str(e)}"
\ No newline at end of file
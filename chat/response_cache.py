@@ -0,0 +1,156 @@
+# chat/response_cache.py
+"""
+Universal va Education assistentlari uchun javoblar keshi.
+
+Bu agentlarda foydalanuvchiga xos kontekst yo'q, shuning uchun bir xil
+savolga Gemini dan qayta so'rash shart emas:
+  1. Aniq moslik: normallashtirilgan matn xeshi bo'yicha (doim yoqiq). Faqat
+     registr, bo'shliqlar va oxiridagi ?!. e'tiborga olinmaydi - belgilar
+     saqlanadi ("2+2" va "2-2", "C++" va "C#" turli savollar);
+  2. O'xshashlik (GEMINI_CACHE_SIMILARITY > 0 bo'lsa, odatda o'chiq): faqat
+     mazmunli so'zlari (to'ldiruvchi so'zlardan tashqari) aynan bir xil va
+     shu tartibdagi savollar orasida, harf trigrammalari bo'yicha Jaccard
+     o'xshashligi chegaradan yuqori bo'lsa. "ascending"/"descending",
+     "returns"/"does not return" kabi bitta so'z farqi hech qachon mos kelmaydi.
+     Nomzodlar shu so'zlar ketma-ketligi bo'yicha indeksdan olinadi - butun
+     kesh ko'rib chiqilmaydi.
+Kesh jarayon ichida, hajmi cheklangan (LRU) va har bir yozuv TTL bilan.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SPACES = re.compile(r"\s+")
+# O'xshashlik tekshiruvida olib tashlanadigan tinish belgilari (matematik/kod belgilari qoladi)
+_PUNCTUATION = re.compile(r"[,;:!?.¿¡\"«»“”„…()\[\]]+")
+
+# Ma'noni o'zgartirmaydigan so'zlar - o'xshashlik tekshiruvida e'tiborga olinmaydi
+_FILLER_WORDS = frozenset({'a', 'an', 'the', 'please', 'pls', 'plz', 'iltimos', 'пожалуйста'})
+
+
+def normalize(text):
+    """Aniq moslik kaliti uchun: registr, ortiqcha bo'shliqlar va oxiridagi ?!. olib tashlanadi."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return _SPACES.sub(' ', text).strip().rstrip('?!.').rstrip()
+
+
+def _fold(text):
+    """O'xshashlik tekshiruvi uchun: tinish belgilari ham olib tashlanadi."""
+    return _SPACES.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+def _content_words(text):
+    return tuple(word for word in text.split() if word not in _FILLER_WORDS)
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _Entry:
+    __slots__ = ('namespace', 'text', 'content', 'grams', 'answer', 'expires')
+
+    def __init__(self, namespace, text, answer, expires):
+        self.namespace = namespace
+        self.text = text
+        folded = _fold(text)
+        self.content = (namespace, _content_words(folded))
+        self.grams = _trigrams(folded)
+        self.answer = answer
+        self.expires = expires
+
+
+class ResponseCache:
+    def __init__(self, max_size=1000, ttl=24 * 60 * 60, similarity=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries = OrderedDict()  # xesh -> _Entry (eng eskisi boshida)
+        self._by_content = {}  # (namespace, mazmunli so'zlar) -> {xesh}
+        self._lock = threading.Lock()
+        self.hits = self.similar_hits = self.misses = 0
+
+    @staticmethod
+    def _key(namespace, text):
+        return hashlib.sha1(f"{namespace}:{text}".encode('utf-8')).hexdigest()
+
+    def get(self, namespace, prompt):
+        """Keshdagi javob yoki None."""
+        text = normalize(prompt)
+        if not text:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            key = self._key(namespace, text)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.answer
+                self._remove(key)
+
+            entry = self._find_similar(namespace, text, now)
+            if entry is not None:
+                self._entries.move_to_end(self._key(namespace, entry.text))
+                self.similar_hits += 1
+                return entry.answer
+
+            self.misses += 1
+            return None
+
+    def _find_similar(self, namespace, text, now):
+        if not self.similarity:
+            return None
+        # Faqat mazmunli so'zlari (raqamlar va belgilar ham) aynan bir xil yozuvlar nomzod bo'ladi
+        text = _fold(text)
+        candidates = self._by_content.get((namespace, _content_words(text)))
+        if not candidates:
+            return None
+        grams = _trigrams(text)
+        best, best_score = None, self.similarity
+        for key in candidates:
+            entry = self._entries[key]
+            if entry.expires <= now:
+                continue
+            score = len(grams & entry.grams) / len(grams | entry.grams)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def set(self, namespace, prompt, answer):
+        text = normalize(prompt)
+        if not text or not answer:
+            return
+        with self._lock:
+            key = self._key(namespace, text)
+            entry = _Entry(namespace, text, answer, time.monotonic() + self.ttl)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_content.setdefault(entry.content, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        keys = self._by_content[entry.content]
+        keys.discard(key)
+        if not keys:
+            del self._by_content[entry.content]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_content.clear()
+
+
+response_cache = ResponseCache(
+    max_size=int(os.getenv('GEMINI_CACHE_SIZE', 1000)),
+    ttl=int(os.getenv('GEMINI_CACHE_TTL', 24 * 60 * 60)),
+    similarity=float(os.getenv('GEMINI_CACHE_SIMILARITY', 0)),
+)
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from core.lookups import semesters, weeks
+from core.models import Schedule, Semester, Subject, User
+
+from .hemis_agent import get_hemis_context
+from .response_cache import ResponseCache, normalize
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def test_symbols_are_part_of_the_key(self):
+        groups = [
+            ["What is 2+2?", "What is 2-2?", "What is 2*2?", "What is 2/2?"],
+            ["Explain C++", "Explain C#", "Explain C"],
+            ["x^2", "x/2"],
+        ]
+        for questions in groups:
+            self.assertEqual(len({normalize(q) for q in questions}), len(questions), questions)
+
+    def test_case_spacing_and_trailing_marks_are_ignored(self):
+        self.assertEqual(normalize("  What   is  2+2?! "), normalize("what is 2+2"))
+        self.assertEqual(normalize("ＡＢＣ"), normalize("abc"))
+
+    def test_exact_tier_does_not_mix_symbol_distinct_questions(self):
+        cache = ResponseCache()
+        cache.set('u', "What is 2+2?", "4")
+        cache.set('u', "Explain C++", "C++ haqida")
+        self.assertEqual(cache.get('u', "what is 2+2"), "4")
+        self.assertIsNone(cache.get('u', "What is 2-2?"))
+        self.assertIsNone(cache.get('u', "Explain C#"))
+
+    def test_fuzzy_tier_keeps_symbols_and_content_words(self):
+        cache = ResponseCache(similarity=0.8)
+        cache.set('u', "How to sort a list, in Python?", "sorted()")
+        self.assertEqual(cache.get('u', "how to sort a list in python"), "sorted()")
+        self.assertIsNone(cache.get('u', "how to sort a dict in python"))
+
+        cache.set('u', "What is 2+2?", "4")
+        self.assertIsNone(cache.get('u', "What is 2-2, exactly"))
+        self.assertIsNone(cache.get('u', "what is 2*2"))
+
+
+class HemisContextCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        semesters.invalidate()
+        weeks.invalidate()
+        self.user = User.objects.create_user(username='talaba', password='x')
+
+    def test_context_follows_current_semester_change(self):
+        semester = Semester.objects.create(code='11', name='1-semestr', current=True)
+        Schedule.objects.create(user=self.user, semester=semester, hemis_id='1', week_id='100',
+                                day_name='Dushanba', subject=Subject.objects.create(name='Fizika'),
+                                lesson_time='08:30')
+        self.assertIn('1-semestr (Davri', get_hemis_context(self.user))
+        self.assertIn('[JORIY SEMESTR]', get_hemis_context(self.user))
+
+        # sync_worker semestrlarni bulk yozuv bilan o'zgartiradi - talaba versiyasi o'zgarmaydi
+        Semester.objects.filter(pk=semester.pk).update(name='1-semestr (yangilangan)', current=False)
+        semesters.bump()
+        with mock.patch.object(semesters, 'check_interval', 0):
+            context = get_hemis_context(self.user)
+        self.assertIn('1-semestr (yangilangan)', context)
+        self.assertNotIn('[JORIY SEMESTR]', context)
+
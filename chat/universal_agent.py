@@ -1,7 +1,24 @@
-import google.generativeai as genai
-from .ai import get_api_key, get_available_model, AGENT_GENERAL
+from asgiref.sync import sync_to_async
 
-def ask_universal_ai(user_message):
+from .ai import get_api_key, get_available_model, get_model, stream_text, AGENT_GENERAL
+from .response_cache import response_cache
+
+# Prompt (Yo'riqnoma)
+SYSTEM_INSTRUCTION = """
+        Sen "Smart Assistant" - Universal sun'iy intellektsan.
+        Vazifang: Foydalanuvchining har qanday savoliga (kod yozish, tarjima, ilmiy savollar, maslahatlar) aniq va lo'nda javob berish.
+        
+        QOIDALAR:
+        1. Javoblaring o'zbek tilida bo'lsin (agar foydalanuvchi boshqa tilni so'ramasa).
+        2. Kod yozganda Markdown formatidan (```python kabi) foydalan.
+        3. O'zingni Hemis tizimi deb tanishtirma, sen universal yordamchisan.
+        4. Javoblar qisqa, mazmunli va foydali bo'lsin.
+        """
+
+def _prompt(user_message):
+    return f"{SYSTEM_INSTRUCTION}\n\nFOYDALANUVCHI SAVOLI: {user_message}"
+
+async def ask_universal_ai(user_message):
     """
     Universal AI (Smart Assistant) uchun mantiq.
     Bu agent Hemis ma'lumotlariga ega emas, faqat umumiy bilimlar bazasidan foydalanadi.
@@ -12,29 +29,46 @@ def ask_universal_ai(user_message):
     if not api_key:
         return "Tizim xatoligi: Universal API kalit topilmadi."
 
+    # Shu (yoki juda o'xshash) savolga javob keshda bo'lsa - Gemini ga so'rov yuborilmaydi
+    cached = response_cache.get(AGENT_GENERAL, user_message)
+    if cached is not None:
+        return cached
+
     try:
         # 2. Sozlash
-        genai.configure(api_key=api_key)
-        model_name = get_available_model()
-        model = genai.GenerativeModel(model_name)
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_GENERAL, model_name)
 
-        # 3. Prompt (Yo'riqnoma)
-        system_instruction = """
-        Sen "Smart Assistant" - Universal sun'iy intellektsan.
-        Vazifang: Foydalanuvchining har qanday savoliga (kod yozish, tarjima, ilmiy savollar, maslahatlar) aniq va lo'nda javob berish.
-        
-        QOIDALAR:
-        1. Javoblaring o'zbek tilida bo'lsin (agar foydalanuvchi boshqa tilni so'ramasa).
-        2. Kod yozganda Markdown formatidan (```python kabi) foydalan.
-        3. O'zingni Hemis tizimi deb tanishtirma, sen universal yordamchisan.
-        4. Javoblar qisqa, mazmunli va foydali bo'lsin.
-        """
+        # 3. Javob olish (async - kutish paytida worker oqimi band bo'lmaydi)
+        response = await model.generate_content_async(_prompt(user_message))
+        response_cache.set(AGENT_GENERAL, user_message, response.text)
+        return response.text
 
-        full_prompt = f"{system_instruction}\n\nFOYDALANUVCHI SAVOLI: {user_message}"
+    except Exception as e:
+        return f"Universal AI xatosi ({model_name}): {str(e)}"
 
-        # 4. Javob olish
-        response = model.generate_content(full_prompt)
-        return response.text
+async def stream_universal_ai(user_message):
+    """ask_universal_ai ning oqimli (stream) varianti - javob bo'laklari kelishi bilan qaytariladi."""
+    api_key = get_api_key(AGENT_GENERAL)
+    
+    if not api_key:
+        yield "Tizim xatoligi: Universal API kalit topilmadi."
+        return
+
+    cached = response_cache.get(AGENT_GENERAL, user_message)
+    if cached is not None:
+        yield cached
+        return
 
+    model_name = '?'
+    try:
+        model_name = await sync_to_async(get_available_model, thread_sensitive=False)()
+        model = get_model(AGENT_GENERAL, model_name)
+        parts = []
+        async for text in stream_text(model, _prompt(user_message)):
+            parts.append(text)
+            yield text
+        # Faqat to'liq (xatosiz) javob keshga yoziladi
+        response_cache.set(AGENT_GENERAL, user_message, ''.join(parts))
     except Exception as e:
-        return f"Universal AI xatosi ({model_name}): {str(e)}"
\ No newline at end of file
+        yield f"Universal AI xatosi ({model_name}): {str(e)}"
\ No newline at end of file
@@ -1,13 +1,36 @@
 import json
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 
 # --- AGENTLAR IMPORTI ---
-from .hemis_agent import ask_hemis_ai          # Hemis AI
-from .universal_agent import ask_universal_ai  # Universal AI
-from .education_agent import ask_education_ai  # Education AI (YANGI)
+from .hemis_agent import ask_hemis_ai, stream_hemis_ai                  # Hemis AI
+from .universal_agent import ask_universal_ai, stream_universal_ai      # Universal AI
+from .education_agent import ask_education_ai, stream_education_ai     # Education AI (YANGI)
+
+
+# ---------------------------------------------------------
+# STREAMING (Server-Sent Events)
+# ---------------------------------------------------------
+def _wants_stream(request, data):
+    """Mijoz {"stream": true} yoki Accept: text/event-stream yuborsa - javob oqim bilan."""
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def _sse_response(chunks):
+    """
+    Matn bo'laklarini (async iterator) SSE hodisalari sifatida yuboradi:
+    data: {"delta": ...}, oxirida event: done. Haqiqiy oqim ASGI server ostida ishlaydi.
+    """
+    async def events():
+        async for text in chunks:
+            yield f"data: {json.dumps({'delta': text})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx javobni buferlamasin
+    return response
 
 # ---------------------------------------------------------
 # 1. HEMIS AI (Faqat o'qish va jadval uchun)
@@ -19,7 +42,7 @@ def chat_view(request):
 
 @csrf_exempt
 @login_required
-def chat_api(request):
+async def chat_api(request):
     """Hemis AI APIsi"""
     if request.method == 'POST':
         try:
@@ -27,7 +50,10 @@ def chat_api(request):
             user_message = data.get('message', '')
             
             # 1. Hemis Agentini chaqiramiz
-            ai_reply = ask_hemis_ai(request.user, user_message)
+            user = await request.auser()
+            if _wants_stream(request, data):
+                return _sse_response(stream_hemis_ai(user, user_message))
+            ai_reply = await ask_hemis_ai(user, user_message)
             
             return JsonResponse({'status': 'success', 'reply': ai_reply})
         except Exception as e:
@@ -46,7 +72,7 @@ def universal_chat_view(request):
 
 @csrf_exempt
 @login_required
-def universal_chat_api(request):
+async def universal_chat_api(request):
     """Universal AI APIsi"""
     if request.method == 'POST':
         try:
@@ -54,7 +80,9 @@ def universal_chat_api(request):
             user_message = data.get('message', '')
             
             # 2. Universal Agentni chaqiramiz
-            ai_reply = ask_universal_ai(user_message)
+            if _wants_stream(request, data):
+                return _sse_response(stream_universal_ai(user_message))
+            ai_reply = await ask_universal_ai(user_message)
             
             return JsonResponse({'status': 'success', 'reply': ai_reply})
         except Exception as e:
@@ -79,7 +107,7 @@ def education_chat_view(request):
 
 @csrf_exempt
 @login_required
-def education_chat_api(request):
+async def education_chat_api(request):
     """Education AI APIsi"""
     if request.method == 'POST':
         try:
@@ -87,7 +115,9 @@ def education_chat_api(request):
             user_message = data.get('message', '')
             
             # 3. Education Agentni chaqiramiz
-            ai_reply = ask_education_ai(user_message)
+            if _wants_stream(request, data):
+                return _sse_response(stream_education_ai(user_message))
+            ai_reply = await ask_education_ai(user_message)
             
             return JsonResponse({'status': 'success', 'reply': ai_reply})
         except Exception as e:
@@ -92,6 +92,34 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Bir nechta jarayon (gunicorn worker, sync_worker) keshni bo'lishishi uchun
+# productionda Redis/Memcached ishlatish tavsiya etiladi.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'unisystem',
+    }
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+# HEMIS API
+HEMIS_BASE_URL = os.getenv('HEMIS_BASE_URL', 'https://student.samtuit.uz/rest/v1')
+HEMIS_POOL_SIZE = int(os.getenv('HEMIS_POOL_SIZE', 20))
+HEMIS_MAX_RETRIES = 3
+HEMIS_BACKOFF_FACTOR = 0.5
+HEMIS_TIMEOUT = 10
+HEMIS_FETCH_WORKERS = 8
+HEMIS_RATE_LIMIT = None  # sekundiga so'rovlar (host bo'yicha), None - cheklovsiz
+HEMIS_TOKEN_TTL = 2 * 60 * 60  # JWT 'exp' bo'lmasa token shuncha soniya amal qiladi deb hisoblanadi
+HEMIS_TOKEN_REFRESH_MARGIN = 5 * 60  # tugashiga shuncha qolganda oldindan yangilanadi
+HEMIS_FRAGMENT_CACHE_TTL = 24 * 60 * 60  # Hemis sahifasi fragmentlari (versiya bilan eskiradi)
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 180))  # bot xabarlari tarixi shuncha kun saqlanadi
+NOTIFICATION_CLAIM_TIMEOUT = 30 * 60  # shuncha soniyada yetkazilmagan band bekor qilinadi (jarayon to'xtagan deb)
+
+# Telegram bot: chiquvchi xabarlar navbati (core/telegram_outbox.py)
+TELEGRAM_SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', 4))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))  # sekundiga xabar (Telegram limiti ~30)
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))  # bitta chatga sekundiga xabar
\ No newline at end of file
@@ -6,7 +6,7 @@ from django.conf.urls.static import static
 # Views importi
 from core.views import (
     login_view, logout_view, dashboard_view, hemis_view, 
-    profile_view, force_update_view,
+    profile_view, force_update_view, sync_status_view, telegram_webhook,
     # Talaba (Essay & Grades)
     student_essay_list, essay_detail_view, student_grades_view,
     # O'qituvchi
@@ -32,6 +32,7 @@ urlpatterns = [
     path('hemis/', hemis_view, name='hemis_data'),
     path('hemis/profile/', profile_view, name='student_profile'),
     path('hemis/update/', force_update_view, name='update_data'),
+    path('hemis/update/status/', sync_status_view, name='sync_status'),
     
     # --- 1. HEMIS AI (Shaxsiy Ma'lumotlar Bo'yicha) ---
     path('ai-chat/', chat_view, name='ai_chat'),
@@ -57,6 +58,9 @@ urlpatterns = [
 
     # --- MOCK EXAM (Imtihonlar) ---
     path('edu/', include('edu.urls')),
+
+    # --- TELEGRAM BOT (webhook rejimi) ---
+    path('telegram/webhook/', telegram_webhook, name='telegram_webhook'),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,7 @@
 # core/admin.py
 
 from django.contrib import admin
-from .models import User, EssayTopic, Submission, Semester, Schedule
+from .models import User, EssayTopic, Submission, Semester, Schedule, SyncJob
 
 # Admin panel sarlavhasini o'zgartirish
 admin.site.site_header = "AI University Boshqaruv Paneli"
@@ -10,7 +10,7 @@ admin.site.index_title = "Tizim Boshqaruvchisi"
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'full_name', 'role', 'group_name', 'hemis_id')
+    list_display = ('username', 'full_name', 'role', 'group_name', 'hemis_id', 'hemis_synced_at')
     list_filter = ('role', 'group_name')
     search_fields = ('username', 'full_name')
 
@@ -34,4 +34,10 @@ class SubmissionAdmin(admin.ModelAdmin):
     final_grade_display.short_description = "Yakuniy Baho"
 
 admin.site.register(Semester)
-admin.site.register(Schedule)
\ No newline at end of file
+admin.site.register(Schedule)
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'status', 'requested_at', 'finished_at', 'attempts')
+    list_filter = ('status',)
+    search_fields = ('user__username', 'user__full_name')
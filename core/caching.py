@@ -0,0 +1,83 @@
+# core/caching.py
+"""
+HEMIS javoblari uchun Django cache asosidagi kesh.
+
+@hemis_cached(ttl=..., stale_ttl=...) bilan belgilangan funksiya (birinchi
+argumenti - User) natijasi user id + argumentlar bo'yicha saqlanadi:
+  - ttl ichida: keshdan qaytariladi;
+  - ttl o'tib, stale_ttl ichida: eski qiymat darhol qaytariladi va fonda
+    yangilanadi (stale-while-revalidate);
+  - undan keyin: odatdagidek HEMIS dan olinadi.
+Kalitga User.hemis_synced_at qo'shiladi: u bazada, shuning uchun sync_worker
+jarayonidagi muvaffaqiyatli sync veb-jarayondagi eski yozuvlarni ham eskirtiradi.
+Token yangilanishi esa kalitni o'zgartirmaydi.
+
+Bazadagi ma'lumotlardan tayyorlangan keshlar (sahifa fragmentlari, chat
+konteksti) esa User.hemis_data_version ni kalitga qo'shadi - sync biror
+narsani o'zgartirsa, u diff bilan bitta tranzaksiyada oshiriladi.
+"""
+import functools
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='hemis-cache')
+
+
+def _synced_version(user):
+    synced_at = user.hemis_synced_at
+    return int(synced_at.timestamp()) if synced_at else 0
+
+
+def _is_success(value):
+    return not (isinstance(value, dict) and value.get('success') is False)
+
+
+def hemis_cached(ttl, stale_ttl=0, cache_if=_is_success, versioned=True):
+    """versioned=False: sync dan keyin ham eskirmaydi (deyarli o'zgarmas ma'lumotlar uchun)."""
+
+    def decorator(func):
+        prefix = f"hemis:{func.__module__}.{func.__qualname__}"
+
+        def make_key(user, args, kwargs):
+            raw = repr((args, sorted(kwargs.items())))
+            arg_hash = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+            version = _synced_version(user) if versioned else 0
+            return f"{prefix}:{user.pk}:{version}:{arg_hash}"
+
+        def store(key, value):
+            if cache_if(value):
+                cache.set(key, (value, time.time() + ttl), ttl + stale_ttl)
+
+        def refresh(key, user, args, kwargs):
+            try:
+                store(key, func(user, *args, **kwargs))
+            except Exception as e:
+                logger.error(f"Cache refresh error ({prefix}): {e}")
+            finally:
+                cache.delete(f"{key}:lock")
+
+        @functools.wraps(func)
+        def wrapper(user, *args, **kwargs):
+            key = make_key(user, args, kwargs)
+            entry = cache.get(key)
+            if entry is not None:
+                value, fresh_until = entry
+                # Eskirgan bo'lsa - fonda yangilaymiz (faqat bitta oqim)
+                if time.time() >= fresh_until and cache.add(f"{key}:lock", 1, 30):
+                    _refresh_pool.submit(refresh, key, user, args, kwargs)
+                return value
+
+            value = func(user, *args, **kwargs)
+            store(key, value)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
@@ -0,0 +1,120 @@
+# core/hemis.py
+"""
+HEMIS API uchun yagona HTTP klient.
+
+Barcha so'rovlar bitta requests.Session orqali o'tadi: ulanishlar pool da
+saqlanadi (keep-alive), shuning uchun har bir so'rov uchun yangi TCP+TLS
+handshake bo'lmaydi. Vaqtinchalik xatolarda (429/5xx) GET so'rovlar
+backoff bilan qayta yuboriladi.
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HostRateLimiter:
+    """
+    Har bir host uchun alohida token-bucket: sekundiga `rate` ta so'rov,
+    `burst` tagacha to'planishi mumkin. Limit oshsa chaqiruvchi kutadi.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        while wait := self.try_acquire(host):
+            time.sleep(wait)
+
+    def try_acquire(self, host):
+        """Kutmasdan urinadi: token olinsa 0, aks holda kutish kerak bo'lgan soniyalar."""
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[host] = (tokens - 1, now)
+                return 0
+            self._buckets[host] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class HemisClient:
+
+    def __init__(self, base_url=None, pool_size=None, max_retries=None, backoff_factor=None, timeout=None):
+        self.base_url = (base_url or settings.HEMIS_BASE_URL).rstrip('/')
+        self.pool_size = pool_size or settings.HEMIS_POOL_SIZE
+        self.max_retries = settings.HEMIS_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_factor = settings.HEMIS_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        self.timeout = timeout or settings.HEMIS_TIMEOUT
+        self._session = None
+        self._lock = threading.Lock()
+        self.rate_limiter = None
+        if settings.HEMIS_RATE_LIMIT:
+            self.set_rate_limit(settings.HEMIS_RATE_LIMIT)
+
+    def set_rate_limit(self, rate, burst=None):
+        """Sekundiga maksimal so'rovlar soni (host bo'yicha). None - cheklovsiz."""
+        self.rate_limiter = HostRateLimiter(rate, burst) if rate else None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET'}),  # Login (POST) qayta yuborilmaydi
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept': 'application/json', 'Connection': 'keep-alive'})
+        return session
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def _throttle(self, url):
+        if self.rate_limiter:
+            self.rate_limiter.acquire(urlsplit(url).netloc)
+
+    def get(self, path, token=None, params=None, timeout=None, headers=None):
+        url = self.url(path)
+        req_headers = dict(headers or {})
+        if token:
+            req_headers['Authorization'] = f'Bearer {token}'
+        self._throttle(url)
+        return self.session.get(url, headers=req_headers, params=params, timeout=timeout or self.timeout)
+
+    def post(self, path, json=None, timeout=None):
+        url = self.url(path)
+        self._throttle(url)
+        return self.session.post(url, json=json, timeout=timeout or self.timeout)
+
+
+hemis = HemisClient()
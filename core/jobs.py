@@ -0,0 +1,85 @@
+# core/jobs.py
+"""
+HEMIS sinxronizatsiyasi uchun baza asosidagi navbat.
+
+Veb-so'rov faqat enqueue_sync() ni chaqiradi va darhol javob qaytaradi,
+og'ir ishni esa `python manage.py sync_worker` jarayoni bajaradi.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SyncJob
+from .sync import sync_student_data
+
+
+def enqueue_sync(user):
+    """
+    Foydalanuvchi uchun sync ishini navbatga qo'yadi.
+    Agar ish allaqachon navbatda yoki bajarilayotgan bo'lsa, o'sha qaytariladi.
+    """
+    now = timezone.now()
+    job, created = SyncJob.objects.get_or_create(user=user, defaults={'requested_at': now})
+    if not created and not job.is_active:
+        # Shartli update: parallel so'rovlar bir-birini bosib ketmaydi
+        SyncJob.objects.filter(pk=job.pk).exclude(status__in=SyncJob.ACTIVE_STATUSES).update(
+            status='pending', requested_at=now, error=None
+        )
+        job.refresh_from_db()
+    return job
+
+
+def claim_next_job():
+    """Navbatdagi eng eski ishni band qiladi (bir nechta worker bir xil ishni olmaydi)."""
+    with transaction.atomic():
+        job = (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('requested_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.finished_at = None
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'finished_at', 'attempts'])
+    return job
+
+
+def claim_job_for(user):
+    """
+    Berilgan foydalanuvchi ishini to'g'ridan-to'g'ri band qiladi (navbatni chetlab).
+    Agar uning ishi allaqachon navbatda/bajarilayotgan bo'lsa - None.
+    """
+    job, _ = SyncJob.objects.get_or_create(user=user, defaults={'status': 'done'})
+    now = timezone.now()
+    claimed = SyncJob.objects.filter(pk=job.pk).exclude(status__in=SyncJob.ACTIVE_STATUSES).update(
+        status='running', requested_at=now, started_at=now, finished_at=None, attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    try:
+        success = sync_student_data(job.user)
+        job.status = 'done' if success else 'failed'
+        job.error = None if success else "Hemis bilan bog'lanib bo'lmadi."
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(minutes=15):
+    """Worker to'xtab qolgan (uzoq vaqt 'running' holatidagi) ishlarni qayta navbatga qo'yadi."""
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return SyncJob.objects.filter(status='running', started_at__lt=cutoff).update(status='pending')
@@ -0,0 +1,124 @@
+# core/lookups.py
+"""
+Kichik va kam o'zgaradigan ma'lumotnoma jadvallari (Subject, Week, Semester)
+uchun jarayon ichidagi kesh.
+
+Jadval bir marta yuklanadi (kalit -> obyekt), topilmagan kalitlar bitta
+so'rov bilan bazadan qidiriladi, kerak bo'lsa bitta bulk_create bilan
+yaratiladi.
+
+Jadval o'zgarganda bump() bazadagi ReferenceVersion ni oshiradi (model
+saqlanganda/o'chirilganda - signal orqali, bulk yozuvlardan keyin - chaqiruvchi
+kod o'zi). Har bir jarayon versiyani ko'pi bilan CHECK_INTERVAL soniyada bir
+marta tekshiradi, shuning uchun sync_worker dagi o'zgarishlar veb-jarayonda
+ham darhol ko'rinadi.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+
+from .models import ReferenceVersion, Semester, Subject, Week
+
+CHECK_INTERVAL = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 5)
+
+
+class ReferenceCache:
+
+    def __init__(self, model, key_field, check_interval=CHECK_INTERVAL):
+        self.model = model
+        self.key_field = key_field
+        self.name = model._meta.label_lower
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._objects = None
+        self._version = None
+        self._checked_at = 0
+
+        uid = f"reference_cache_{self.name}"
+        post_save.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(self._on_change, sender=model, weak=False, dispatch_uid=uid)
+
+    def _on_change(self, **kwargs):
+        self.bump()
+
+    def bump(self):
+        """Jadval o'zgardi: barcha jarayonlardagi keshlar eskiradi (tranzaksiya ichida chaqirilishi mumkin)."""
+        if not ReferenceVersion.objects.filter(name=self.name).update(version=F('version') + 1):
+            ReferenceVersion.objects.bulk_create([ReferenceVersion(name=self.name, version=1)], ignore_conflicts=True)
+        transaction.on_commit(self.invalidate)
+
+    def invalidate(self):
+        """Faqat shu jarayondagi nusxani tashlaydi."""
+        with self._lock:
+            self._objects = None
+
+    def _ensure_loaded(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._objects is not None and now - self._checked_at < self.check_interval:
+                return self._objects
+
+            version = ReferenceVersion.objects.filter(name=self.name).values_list('version', flat=True).first() or 0
+            if self._objects is None or version != self._version:
+                objects = {}
+                for obj in self.model.objects.order_by('id'):
+                    objects.setdefault(getattr(obj, self.key_field), obj)
+                self._objects = objects
+                self._version = version
+            self._checked_at = now
+            return self._objects
+
+    def all(self):
+        return list(self._ensure_loaded().values())
+
+    def version(self):
+        """Yuklangan nusxaning versiyasi - undan tayyorlangan keshlar kalitiga qo'shiladi."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._version
+
+    def get(self, key):
+        return self.get_many([key]).get(str(key))
+
+    def get_many(self, keys):
+        """{kalit: obyekt}. Keshda yo'q kalitlar bitta so'rov bilan bazadan olinadi."""
+        keys = {str(k) for k in keys if k is not None}
+        objects = self._ensure_loaded()
+        missing = [k for k in keys if k not in objects]
+
+        if missing:
+            lookup = {f"{self.key_field}__in": missing}
+            with self._lock:
+                for obj in self.model.objects.filter(**lookup).order_by('id'):
+                    objects.setdefault(getattr(obj, self.key_field), obj)
+
+        return {k: objects[k] for k in keys if k in objects}
+
+    def ids(self, keys, defaults=None):
+        """
+        {kalit: id}. Bazada ham yo'q kalitlar bitta bulk_create bilan yaratiladi.
+        defaults(kalit) -> qo'shimcha maydonlar (dict).
+        """
+        keys = {str(k) for k in keys if k is not None}
+        found = self.get_many(keys)
+        missing = [k for k in keys if k not in found]
+
+        if missing:
+            self.model.objects.bulk_create([
+                self.model(**{self.key_field: k}, **(defaults(k) if defaults else {}))
+                for k in missing
+            ])
+            self.bump()
+            # MySQL bulk_create dan keyin id qaytarmaydi - qayta o'qiymiz
+            found.update(self.get_many(missing))
+
+        return {k: obj.id for k, obj in found.items()}
+
+
+subjects = ReferenceCache(Subject, 'name')
+weeks = ReferenceCache(Week, 'week_id')
+semesters = ReferenceCache(Semester, 'code')
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.hemis import hemis
+from core.jobs import claim_job_for, run_job
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "HEMIS login/paroli saqlangan barcha talabalarni sinxronizatsiya qiladi. "
+        "Eng eski ma'lumotlar birinchi yangilanadi. Cron orqali ertalab ishga "
+        "tushirish uchun mo'ljallangan, masalan: 0 6 * * * python manage.py sync_all"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Bir vaqtda sinxronizatsiya qilinadigan talabalar soni")
+        parser.add_argument('--rate', type=float, default=10, help="HEMIS ga sekundiga maksimal so'rovlar (host bo'yicha)")
+        parser.add_argument('--stale-minutes', type=int, default=360, help="Shundan yangiroq sinxronizatsiya qilinganlar o'tkazib yuboriladi")
+        parser.add_argument('--limit', type=int, default=None, help="Bir ishga tushishda maksimal talabalar soni")
+
+    def handle(self, *args, **options):
+        hemis.set_rate_limit(options['rate'])
+
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        users = (
+            User.objects.filter(role='student')
+            .exclude(Q(hemis_login__isnull=True) | Q(hemis_login='') | Q(hemis_password__isnull=True) | Q(hemis_password=''))
+            .filter(Q(hemis_synced_at__isnull=True) | Q(hemis_synced_at__lt=cutoff))
+            .order_by(F('hemis_synced_at').asc(nulls_first=True), 'id')
+        )
+        if options['limit']:
+            users = users[:options['limit']]
+
+        # Har bir muvaffaqiyatli sync hemis_synced_at ni yangilaydi, shuning uchun
+        # to'xtatilgan ishga tushirish qayta chaqirilganda qolgan joyidan davom etadi.
+        user_ids = list(users.values_list('id', flat=True))
+        total = len(user_ids)
+        self.stdout.write(f"🔄 {total} ta talaba sinxronizatsiya qilinadi ({options['workers']} worker)...")
+
+        stats = {'done': 0, 'failed': 0, 'skipped': 0}
+        lock = threading.Lock()
+        started = time.monotonic()
+
+        def sync_one(user_id):
+            try:
+                user = User.objects.get(pk=user_id)
+                job = claim_job_for(user)
+                if job is None:
+                    result = 'skipped'  # Bu talaba allaqachon sync_worker navbatida
+                else:
+                    result = run_job(job).status
+            except Exception as e:
+                self.stderr.write(f"   -> Xatolik (id={user_id}): {e}")
+                result = 'failed'
+            finally:
+                connection.close()
+
+            with lock:
+                stats[result] = stats.get(result, 0) + 1
+                processed = sum(stats.values())
+                if processed % 50 == 0 or processed == total:
+                    self.stdout.write(f"   -> {processed}/{total} ({time.monotonic() - started:.0f}s)")
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='sync-all') as pool:
+            in_flight = set()
+            for user_id in user_ids:
+                # Navbatni chegaralaymiz: xotirada minglab future to'planmaydi
+                if len(in_flight) >= options['workers'] * 2:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.add(pool.submit(sync_one, user_id))
+            wait(in_flight)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Tugadi: {stats['done']} muvaffaqiyatli, {stats['failed']} xato, {stats['skipped']} o'tkazib yuborildi"
+        ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import claim_next_job, run_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "HEMIS sinxronizatsiya navbatidagi ishlarni fonda bajaradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=2, help="Navbat bo'sh bo'lganda kutish (soniya)")
+        parser.add_argument('--stale-minutes', type=int, default=15, help="Shuncha daqiqadan beri 'running' ishlar qayta navbatga qo'yiladi")
+        parser.add_argument('--once', action='store_true', help="Navbat bo'shaguncha ishlab, so'ng chiqish")
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Sync worker ishga tushdi...")
+        last_requeue = 0
+
+        while True:
+            close_old_connections()
+
+            if time.monotonic() - last_requeue > 60:
+                requeued = requeue_stale_jobs(options['stale_minutes'])
+                if requeued:
+                    self.stdout.write(f"   -> {requeued} ta to'xtab qolgan ish qayta navbatga qo'yildi")
+                last_requeue = time.monotonic()
+
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            job = run_job(job)
+            self.stdout.write(f"   -> {job.user.username}: {job.get_status_display()}")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_notificationlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='hemis_id',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='hemis_id',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='hemis_id',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_schedule_attendance_task_hemis_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Bajarildi'), ('failed', 'Xatolik')], db_index=True, default='pending', max_length=20, verbose_name='Holat')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name="So'ralgan vaqt")),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Boshlangan vaqt')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Tugagan vaqt')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Urinishlar')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Xatolik')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_job', to=settings.AUTH_USER_MODEL, verbose_name='Talaba')),
+            ],
+            options={
+                'verbose_name': 'Sinxronizatsiya',
+                'verbose_name_plural': '🔄 Sinxronizatsiya Navbati',
+            },
+        ),
+    ]
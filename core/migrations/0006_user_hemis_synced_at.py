@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_syncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='hemis_synced_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Oxirgi sinxronizatsiya'),
+        ),
+    ]
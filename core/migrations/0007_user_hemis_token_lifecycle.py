@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_hemis_synced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='hemis_token_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Token tugash vaqti'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='hemis_token_issued_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Token berilgan vaqt'),
+        ),
+    ]
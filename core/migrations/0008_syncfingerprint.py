@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_hemis_token_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester_code', models.CharField(max_length=20)),
+                ('endpoint', models.CharField(max_length=50)),
+                ('digest', models.CharField(max_length=64)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=64, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_fingerprints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sync Xeshi',
+                'verbose_name_plural': 'Sync Xeshlari',
+                'unique_together': {('user', 'semester_code', 'endpoint')},
+            },
+        ),
+    ]
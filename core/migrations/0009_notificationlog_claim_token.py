@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_syncfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationlog',
+            name='claim_token',
+            field=models.CharField(blank=True, db_index=True, max_length=32, null=True, verbose_name='Band qilish tokeni'),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='sent_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Yuborilgan vaqt'),
+        ),
+    ]
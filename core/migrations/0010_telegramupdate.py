@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_notificationlog_claim_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('update_id', models.BigIntegerField(unique=True, verbose_name='Update ID')),
+                ('received_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Qabul qilingan vaqt')),
+            ],
+            options={
+                'verbose_name': 'Telegram Yangilanishi',
+                'verbose_name_plural': 'Telegram Yangilanishlari',
+            },
+        ),
+    ]
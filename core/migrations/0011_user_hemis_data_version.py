@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_telegramupdate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='hemis_data_version',
+            field=models.PositiveIntegerField(default=1, verbose_name="Hemis ma'lumotlari versiyasi"),
+        ),
+    ]
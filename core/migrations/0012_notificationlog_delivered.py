@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_hemis_data_version'),
+    ]
+
+    operations = [
+        # Mavjud yozuvlar allaqachon yuborilgan xabarlar - ular delivered=True bo'ladi
+        migrations.AddField(
+            model_name='notificationlog',
+            name='delivered',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='Yetkazildi'),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='delivered',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Yetkazildi'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_referenceversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(unique=True, verbose_name='Chat ID')),
+                ('step', models.CharField(choices=[('login', 'Login kutilmoqda'), ('password', 'Parol kutilmoqda')], max_length=20, verbose_name='Qadam')),
+                ('login', models.CharField(blank=True, max_length=150, verbose_name='Login')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Yangilangan vaqt')),
+            ],
+            options={
+                'verbose_name': 'Telegram Suhbati',
+                'verbose_name_plural': 'Telegram Suhbatlari',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 # -----------------------------------------------------------------------------
 # 1. FOYDALANUVCHI MODELI (USER)
@@ -19,6 +20,11 @@ class User(AbstractUser):
     hemis_login = models.CharField(max_length=50, null=True, blank=True, verbose_name="Hemis Login")
     hemis_password = models.CharField(max_length=100, null=True, blank=True, verbose_name="Hemis Parol")
     hemis_token = models.CharField(max_length=255, null=True, blank=True, verbose_name="Token")
+    hemis_token_issued_at = models.DateTimeField(null=True, blank=True, verbose_name="Token berilgan vaqt")
+    hemis_token_expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Token tugash vaqti")
+    hemis_synced_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Oxirgi sinxronizatsiya")
+    # Sync jadval/davomat/topshiriqlarni o'zgartirganda oshiriladi (sahifa va chat keshlari kaliti)
+    hemis_data_version = models.PositiveIntegerField(default=1, verbose_name="Hemis ma'lumotlari versiyasi")
     
     # TELEGRAM INTEGRATSIYASI
     telegram_chat_id = models.CharField(max_length=50, unique=True, null=True, blank=True, verbose_name="Telegram ID")
@@ -79,6 +85,7 @@ class Week(models.Model):
 class Schedule(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedules')
     semester = models.ForeignKey(Semester, on_delete=models.CASCADE)
+    hemis_id = models.CharField(max_length=64, null=True, db_index=True)
     week_id = models.CharField(max_length=20, null=True)
     day_name = models.CharField(max_length=20)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -94,6 +101,7 @@ class Schedule(models.Model):
 class Attendance(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendances')
     semester = models.ForeignKey(Semester, on_delete=models.CASCADE)
+    hemis_id = models.CharField(max_length=64, null=True, db_index=True)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     date = models.DateField()
     hours = models.IntegerField()
@@ -106,6 +114,7 @@ class Attendance(models.Model):
 class Task(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
     semester = models.ForeignKey(Semester, on_delete=models.CASCADE)
+    hemis_id = models.CharField(max_length=64, null=True, db_index=True)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     deadline = models.CharField(max_length=50)
@@ -215,7 +224,13 @@ class NotificationLog(models.Model):
     # Unikal kalit: masalan "topic_15_1day" yoki "subject_3_nb_5"
     notification_key = models.CharField(max_length=255, verbose_name="Bildirishnoma Kaliti")
     
-    sent_at = models.DateTimeField(auto_now_add=True, verbose_name="Yuborilgan vaqt")
+    sent_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Yuborilgan vaqt")
+
+    # Qaysi claim_notifications() chaqiruvi bu yozuvni band qilgani
+    claim_token = models.CharField(max_length=32, null=True, blank=True, db_index=True, verbose_name="Band qilish tokeni")
+
+    # Band qilingan, lekin hali yetkazilmagan (yoki Telegram rad etmagan) yozuvlar False
+    delivered = models.BooleanField(default=False, db_index=True, verbose_name="Yetkazildi")
 
     def __str__(self):
         return f"{self.user.username} - {self.notification_key}"
@@ -224,4 +239,125 @@ class NotificationLog(models.Model):
         # Bir xil kalitli xabar bir userga faqat bir marta yozilishi mumkin
         unique_together = ('user', 'notification_key') 
         verbose_name = "Bot Tarixi"
-        verbose_name_plural = "🤖 Bot Bildirishnomalari"
\ No newline at end of file
+        verbose_name_plural = "🤖 Bot Bildirishnomalari"
+
+
+class TelegramUpdate(models.Model):
+    """
+    Webhook orqali qabul qilingan Telegram yangilanishlari.
+    Javob kechiksa Telegram yangilanishni qayta yuboradi - update_id bo'yicha
+    unikal yozuv uni ikkinchi marta qayta ishlashdan saqlaydi.
+    """
+    update_id = models.BigIntegerField(unique=True, verbose_name="Update ID")
+    received_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Qabul qilingan vaqt")
+
+    def __str__(self):
+        return str(self.update_id)
+
+    class Meta:
+        verbose_name = "Telegram Yangilanishi"
+        verbose_name_plural = "Telegram Yangilanishlari"
+
+
+class TelegramConversation(models.Model):
+    """
+    Botdagi /start suhbatining holati (login -> parol).
+    Bazada saqlanadi - webhook ni bir nechta ASGI worker qabul qilganda ham
+    keyingi xabar qaysi workerga tushishidan qat'i nazar suhbat davom etadi.
+    Parol saqlanmaydi.
+    """
+    STEP_LOGIN = 'login'
+    STEP_PASSWORD = 'password'
+    STEP_CHOICES = (
+        (STEP_LOGIN, 'Login kutilmoqda'),
+        (STEP_PASSWORD, 'Parol kutilmoqda'),
+    )
+
+    chat_id = models.BigIntegerField(unique=True, verbose_name="Chat ID")
+    step = models.CharField(max_length=20, choices=STEP_CHOICES, verbose_name="Qadam")
+    login = models.CharField(max_length=150, blank=True, verbose_name="Login")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Yangilangan vaqt")
+
+    def __str__(self):
+        return f"{self.chat_id} ({self.step})"
+
+    class Meta:
+        verbose_name = "Telegram Suhbati"
+        verbose_name_plural = "Telegram Suhbatlari"
+
+
+# -----------------------------------------------------------------------------
+# 5. HEMIS SINXRONIZATSIYA (NAVBAT VA JAVOB XESHLARI)
+# -----------------------------------------------------------------------------
+
+class SyncJob(models.Model):
+    """
+    Fonda bajariladigan HEMIS sinxronizatsiya ishi.
+    Har bir foydalanuvchi uchun bitta qator: qayta so'ralganda yangi ish
+    yaratilmaydi, mavjudi yana navbatga qo'yiladi (deduplikatsiya).
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Navbatda'),
+        ('running', 'Bajarilmoqda'),
+        ('done', 'Bajarildi'),
+        ('failed', 'Xatolik'),
+    )
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='sync_job', verbose_name="Talaba")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="Holat")
+    requested_at = models.DateTimeField(default=timezone.now, verbose_name="So'ralgan vaqt")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Boshlangan vaqt")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Tugagan vaqt")
+    attempts = models.IntegerField(default=0, verbose_name="Urinishlar")
+    error = models.TextField(null=True, blank=True, verbose_name="Xatolik")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    class Meta:
+        verbose_name = "Sinxronizatsiya"
+        verbose_name_plural = "🔄 Sinxronizatsiya Navbati"
+
+
+class SyncFingerprint(models.Model):
+    """
+    HEMIS endpoint javobining oxirgi xeshi (va ETag/Last-Modified).
+    Javob o'zgarmagan bo'lsa, sync uni qayta parse qilmaydi va bazaga yozmaydi.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_fingerprints')
+    semester_code = models.CharField(max_length=20)
+    endpoint = models.CharField(max_length=50)
+    digest = models.CharField(max_length=64)
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    last_modified = models.CharField(max_length=64, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.semester_code} - {self.endpoint}"
+
+    class Meta:
+        unique_together = ('user', 'semester_code', 'endpoint')
+        verbose_name = "Sync Xeshi"
+        verbose_name_plural = "Sync Xeshlari"
+
+
+class ReferenceVersion(models.Model):
+    """
+    Ma'lumotnoma jadvallari (Semester, Week, Subject) versiyasi.
+    Jadval o'zgarganda oshiriladi - har bir jarayondagi core/lookups.py keshi
+    uni tekshirib, eskirgan nusxani qayta yuklaydi.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    class Meta:
+        verbose_name = "Ma'lumotnoma versiyasi"
+        verbose_name_plural = "Ma'lumotnoma versiyalari"
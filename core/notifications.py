@@ -0,0 +1,67 @@
+# core/notifications.py
+"""
+Bot bildirishnomalarini takrorlanmasdan yuborish (NotificationLog orqali).
+
+Xabar yuborishdan oldin (user, kalit) juftliklari bitta INSERT ... ON CONFLICT
+DO NOTHING bilan "band qilinadi". Unikal indeks tufayli bir juftlikni faqat
+bitta jarayon band qila oladi - bot qayta ishga tushsa yoki bir nechta bot
+jarayoni ishlasa ham xabar ikki marta ketmaydi. Yuborish muvaffaqiyatsiz
+bo'lsa, release_notification() keyingi tekshiruvda qayta urinishga imkon beradi.
+
+Yetkazilgan xabar mark_delivered() bilan belgilanadi. Jarayon xabarlarni
+yubormasdan to'xtasa (navbat faqat xotirada), uning bandlari delivered=False
+bo'lib qoladi - release_stale_claims() ularni NOTIFICATION_CLAIM_TIMEOUT dan
+keyin bekor qiladi va eslatma keyingi tekshiruvda qayta yuboriladi.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import NotificationLog
+
+
+def claim_notifications(pairs):
+    """
+    (user_id, notification_key) juftliklarini band qiladi.
+    Faqat shu chaqiruv band qilgan (ilgari yuborilmagan) juftliklar qaytariladi.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    token = uuid.uuid4().hex
+    NotificationLog.objects.bulk_create(
+        [NotificationLog(user_id=user_id, notification_key=key, claim_token=token) for user_id, key in pairs],
+        ignore_conflicts=True,
+    )
+    return set(NotificationLog.objects.filter(claim_token=token).values_list('user_id', 'notification_key'))
+
+
+def release_notification(user_id, key):
+    """Yuborilmay qolgan xabar bandini bekor qiladi."""
+    NotificationLog.objects.filter(user_id=user_id, notification_key=key).delete()
+
+
+def mark_delivered(user_id, key):
+    """
+    Xabarni yakunlangan deb belgilaydi: Telegram ga yetkazilgan yoki Telegram
+    uni rad etgan (bot bloklangan, chat topilmadi) - ikkala holatda ham qayta yuborilmaydi.
+    """
+    NotificationLog.objects.filter(user_id=user_id, notification_key=key).update(delivered=True)
+
+
+def release_stale_claims(timeout=None):
+    """Uzoq vaqt yetkazilmay qolgan bandlarni bekor qiladi, bekor qilinganlar sonini qaytaradi."""
+    timeout = settings.NOTIFICATION_CLAIM_TIMEOUT if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    deleted, _ = NotificationLog.objects.filter(delivered=False, sent_at__lt=cutoff).delete()
+    return deleted
+
+
+def prune_notification_log(days=None):
+    """Saqlash muddatidan eski yozuvlarni o'chiradi, o'chirilganlar sonini qaytaradi."""
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = NotificationLog.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
@@ -1,16 +1,18 @@
-import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import time
 
+from .caching import hemis_cached
+from .hemis import hemis
+
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://student.samtuit.uz/rest/v1"
 TIMEOUT = 10
 
 def get_auth_token(login, password):
     try:
-        resp = requests.post(f"{BASE_URL}/auth/login", json={'login': login, 'password': password}, timeout=TIMEOUT)
+        resp = hemis.post("/auth/login", json={'login': login, 'password': password}, timeout=TIMEOUT)
         data = resp.json()
         if data.get('success'):
             return {'success': True, 'token': data['data']['token']}
@@ -18,23 +20,41 @@ def get_auth_token(login, password):
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def get_student_profile(token):
-    headers = {'Authorization': f'Bearer {token}'}
+# Profil va hujjatlar so'rovlari parallel yuboriladi
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hemis-services')
+
+@hemis_cached(ttl=7 * 24 * 3600, stale_ttl=30 * 24 * 3600, cache_if=bool, versioned=False)
+def _get_diploma(user):
+    """
+    Diplom ma'lumoti deyarli o'zgarmaydi - user bo'yicha uzoq muddat keshlanadi.
+    Xato (exception) va bo'sh natija (diplom topilmadi) keshlanmaydi.
+    """
+    doc_data = hemis.get("/student/document-all", token=user.hemis_token, timeout=TIMEOUT).json()
+    if not doc_data.get('success'):
+        raise ValueError(doc_data.get('error', 'Hujjatlar topilmadi'))
+
+    for d in doc_data.get('data', []):
+        if d.get('type') == 'diploma':
+            # Atributlarni bir marta o'tib, label -> value lug'atiga yig'amiz
+            attrs = {a.get('label'): a.get('value') for a in d.get('attributes', [])}
+            return {
+                'number': attrs.get('Diplom raqami', '-'),
+                'date': attrs.get('Qayd sanasi', '-')
+            }
+    return None
+
+@hemis_cached(ttl=300, stale_ttl=3600)
+def get_student_profile(user):
     try:
-        resp = requests.get(f"{BASE_URL}/account/me", headers=headers, timeout=TIMEOUT)
+        diploma_future = _pool.submit(_get_diploma, user)
+        resp = hemis.get("/account/me", token=user.hemis_token, timeout=TIMEOUT)
         data = resp.json()
-        
-        doc_resp = requests.get(f"{BASE_URL}/student/document-all", headers=headers, timeout=TIMEOUT)
-        doc_data = doc_resp.json()
-        diploma = None
-        if doc_data.get('success'):
-            for d in doc_data.get('data', []):
-                if d.get('type') == 'diploma':
-                    diploma = {
-                        'number': next((a['value'] for a in d['attributes'] if a['label'] == 'Diplom raqami'), '-'),
-                        'date': next((a['value'] for a in d['attributes'] if a['label'] == 'Qayd sanasi'), '-')
-                    }
-                    break
+
+        try:
+            diploma = diploma_future.result()
+        except Exception as e:
+            logger.error(f"Diploma error: {e}")
+            diploma = None
 
         if data.get('success'):
             info = data['data']
@@ -72,10 +92,10 @@ def get_student_profile(token):
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def get_semester_list(token):
-    headers = {'Authorization': f'Bearer {token}'}
+@hemis_cached(ttl=3600, stale_ttl=24 * 3600, cache_if=bool)
+def get_semester_list(user):
     try:
-        resp = requests.get(f"{BASE_URL}/education/semesters", headers=headers, timeout=TIMEOUT)
+        resp = hemis.get("/education/semesters", token=user.hemis_token, timeout=TIMEOUT)
         data = resp.json()
         semesters = []
         if data.get('success'):
@@ -92,15 +112,16 @@ def get_semester_list(token):
     except:
         return []
 
-def get_attendance(token, semester_id):
-    headers = {'Authorization': f'Bearer {token}'}
+@hemis_cached(ttl=300, stale_ttl=1800)
+def get_attendance(user, semester_id):
     params = {'semester': semester_id} if semester_id else {}
     try:
-        resp = requests.get(f"{BASE_URL}/education/attendance", headers=headers, params=params, timeout=TIMEOUT)
+        resp = hemis.get("/education/attendance", token=user.hemis_token, params=params, timeout=TIMEOUT)
         data = resp.json()
-        stats = {'total': 0, 'sababli': 0, 'sababsiz': 0, 'list': []}
+        # success=False (token eskirgan va h.k.) keshlanmaydi - "NB yo'q" deb ko'rsatilmasligi uchun
+        stats = {'success': bool(data.get('success')), 'total': 0, 'sababli': 0, 'sababsiz': 0, 'list': []}
         
-        if data.get('success'):
+        if stats['success']:
             items = data['data'] if isinstance(data['data'], list) else data['data'].get('items', [])
             for i in items:
                 off = i.get('absent_off', 0) or 0
@@ -134,12 +155,86 @@ def get_attendance(token, semester_id):
         return stats
     except Exception as e:
         logger.error(f"Attendance error: {e}")
-        return {'total': 0}
+        return {'success': False, 'total': 0, 'sababli': 0, 'sababsiz': 0, 'list': []}
+
+WEEK_DAYS_ORDER = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
 
-def get_schedule_with_weeks(token, semester_id, selected_week_id=None):
-    headers = {'Authorization': f'Bearer {token}'}
+@hemis_cached(ttl=600, stale_ttl=3600, cache_if=lambda index: bool(index['weeks']))
+def _get_schedule_index(user, semester_id):
+    """
+    Semestr jadvalini bir marta o'qib, hafta bo'yicha tayyor kunlar ro'yxatiga
+    indekslaydi. Keshlangani uchun haftalar orasida o'tish - oddiy lug'at qidiruvi.
+    """
     params = {'semester': semester_id} if semester_id else {}
+    resp = hemis.get("/education/schedule", token=user.hemis_token, params=params, timeout=TIMEOUT)
+    data = resp.json()
+
+    items = []
+    if data.get('success'):
+        items = data['data'] if isinstance(data['data'], list) else data['data'].get('items', [])
+
+    weeks_map = {}
+    lessons_by_day = {}  # (hafta, kun indeksi) -> darslar
+    seen = set()         # (hafta, kun indeksi, vaqt, fan) - takrorlarni O(1) da aniqlash
+
+    for item in items:
+        w_id = item.get('_week')
+        if not w_id:
+            continue
+        if w_id not in weeks_map:
+            weeks_map[w_id] = {
+                'id': w_id,
+                'start': item.get('weekStartTime'),
+                'end': item.get('weekEndTime')
+            }
+
+        if not item.get('lesson_date'):
+            continue
+        day_index = datetime.fromtimestamp(item['lesson_date']).weekday()
+        if day_index > 5: continue
+
+        subj = item.get('subject', {}).get('name')
+        start = item.get('lessonPair', {}).get('start_time')
+        end = item.get('lessonPair', {}).get('end_time')
+        time_str = f"{start} - {end}"
 
+        dedup_key = (w_id, day_index, time_str, subj)
+        if dedup_key in seen: continue
+        seen.add(dedup_key)
+
+        lessons_by_day.setdefault((w_id, day_index), []).append({
+            'subject': subj,
+            'time': time_str,
+            'teacher': item.get('employee', {}).get('name'),
+            'room': item.get('auditorium', {}).get('name', 'Onlayn'),
+            'type': item.get('trainingType', {}).get('name')
+        })
+
+    sorted_weeks = sorted(weeks_map.values(), key=lambda x: x['start'])
+    weeks = []
+    for idx, w in enumerate(sorted_weeks):
+        s_date = datetime.fromtimestamp(w['start']).strftime('%d.%m')
+        e_date = datetime.fromtimestamp(w['end']).strftime('%d.%m')
+        weeks.append({
+            'id': w['id'],
+            'name': f"{idx + 1}-hafta ({s_date} - {e_date})",
+            'start': w['start'],
+            'end': w['end']
+        })
+
+    schedule_by_week = {}
+    for w in weeks:
+        days = []
+        for day_index, day_name in enumerate(WEEK_DAYS_ORDER):
+            lessons = lessons_by_day.get((w['id'], day_index))
+            if lessons:
+                lessons.sort(key=lambda x: x['time'])
+                days.append({'day_name': day_name, 'lessons': lessons})
+        schedule_by_week[w['id']] = days
+
+    return {'weeks': weeks, 'schedule_by_week': schedule_by_week}
+
+def get_schedule_with_weeks(user, semester_id, selected_week_id=None):
     result = {
         'weeks': [],
         'schedule': [],
@@ -147,33 +242,11 @@ def get_schedule_with_weeks(token, semester_id, selected_week_id=None):
     }
 
     try:
-        resp = requests.get(f"{BASE_URL}/education/schedule", headers=headers, params=params, timeout=TIMEOUT)
-        data = resp.json()
-        
-        items = []
-        if data.get('success'):
-            items = data['data'] if isinstance(data['data'], list) else data['data'].get('items', [])
-
-        if not items:
+        index = _get_schedule_index(user, semester_id)
+        if not index['weeks']:
             return result
 
-        weeks_map = {}
-        valid_week_ids = set()
-
-        for item in items:
-            w_id = item.get('_week')
-            start = item.get('weekStartTime')
-            end = item.get('weekEndTime')
-            
-            if w_id:
-                valid_week_ids.add(int(w_id)) 
-                if w_id not in weeks_map:
-                    weeks_map[w_id] = {
-                        'id': w_id,
-                        'start': start,
-                        'end': end
-                    }
-        
+        valid_week_ids = {int(w['id']) for w in index['weeks']}
         if selected_week_id:
             try:
                 if int(selected_week_id) not in valid_week_ids:
@@ -181,18 +254,11 @@ def get_schedule_with_weeks(token, semester_id, selected_week_id=None):
             except:
                 selected_week_id = None
 
-        sorted_weeks = sorted(weeks_map.values(), key=lambda x: x['start'])
         current_ts = int(time.time())
         final_weeks = []
-        for idx, w in enumerate(sorted_weeks):
-            s_date = datetime.fromtimestamp(w['start']).strftime('%d.%m')
-            e_date = datetime.fromtimestamp(w['end']).strftime('%d.%m')
+        for w in index['weeks']:
             is_current = (w['start'] <= current_ts <= w['end'])
-            final_weeks.append({
-                'id': w['id'],
-                'name': f"{idx + 1}-hafta ({s_date} - {e_date})",
-                'current': is_current
-            })
+            final_weeks.append({'id': w['id'], 'name': w['name'], 'current': is_current})
             if not selected_week_id and is_current:
                 selected_week_id = w['id']
 
@@ -202,65 +268,24 @@ def get_schedule_with_weeks(token, semester_id, selected_week_id=None):
         result['weeks'] = final_weeks
         result['active_week_id'] = selected_week_id
 
-        week_days_order = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
-        grouped_schedule = {day: [] for day in week_days_order}
-        
         try:
             target_week = int(selected_week_id) if selected_week_id else 0
         except:
             target_week = 0
 
-        for item in items:
-            if item.get('_week') != target_week: continue
-            if item.get('lesson_date'):
-                dt = datetime.fromtimestamp(item['lesson_date'])
-                day_index = dt.weekday()
-                if day_index > 5: continue 
-                day_name = week_days_order[day_index]
-            else:
-                continue
-
-            subj = item.get('subject', {}).get('name')
-            start = item.get('lessonPair', {}).get('start_time')
-            end = item.get('lessonPair', {}).get('end_time')
-            
-            existing = False
-            for lesson in grouped_schedule[day_name]:
-                if lesson['time'] == f"{start} - {end}" and lesson['subject'] == subj:
-                    existing = True
-                    break
-            
-            if not existing:
-                grouped_schedule[day_name].append({
-                    'subject': subj,
-                    'time': f"{start} - {end}",
-                    'teacher': item.get('employee', {}).get('name'),
-                    'room': item.get('auditorium', {}).get('name', 'Onlayn'),
-                    'type': item.get('trainingType', {}).get('name')
-                })
-
-        final_list = []
-        for day in week_days_order:
-            if grouped_schedule[day]:
-                grouped_schedule[day].sort(key=lambda x: x['time'])
-                final_list.append({
-                    'day_name': day,
-                    'lessons': grouped_schedule[day]
-                })
-        
-        result['schedule'] = final_list
+        result['schedule'] = index['schedule_by_week'].get(target_week, [])
         return result
 
     except Exception as e:
         logger.error(f"Schedule error: {e}")
         return result
 
-def get_tasks(token, semester_id):
-    headers = {'Authorization': f'Bearer {token}'}
+@hemis_cached(ttl=300, stale_ttl=1800, cache_if=bool)
+def get_tasks(user, semester_id):
     params = {'semester': semester_id} if semester_id else {}
     
     try:
-        resp = requests.get(f"{BASE_URL}/education/task-list", headers=headers, params=params, timeout=TIMEOUT)
+        resp = hemis.get("/education/task-list", token=user.hemis_token, params=params, timeout=TIMEOUT)
         data = resp.json()
         tasks = []
         if data.get('success'):
@@ -1,10 +1,337 @@
 # core/sync.py
-import requests
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
 from django.conf import settings
-from .models import Semester, Week, Schedule, Attendance, Task, Subject
-from .services import get_auth_token  # Yordamchi funksiya kerak bo'ladi
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import User, Semester, Week, Schedule, Attendance, Task, SyncFingerprint
+from .hemis import hemis
+from .lookups import semesters, subjects, weeks
+from .tokens import ensure_token
+
+TIMEOUT = 10
+
+# Har bir endpoint uchun alohida timeout (soniya)
+ENDPOINT_TIMEOUTS = {
+    '/education/semester': 5,
+    '/education/week': 10,
+    '/education/schedule': 15,
+    '/education/attendance': 15,
+    '/education/performance': 15,
+}
+
+# Mustaqil endpointlar shu pool orqali parallel yuklanadi.
+# Pool umumiy - bir vaqtda ko'p sync bo'lsa ham HEMIS ga ulanishlar soni chegaralangan.
+_fetch_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'HEMIS_FETCH_WORKERS', 8),
+    thread_name_prefix='hemis-fetch',
+)
+
+# Diff vaqtida solishtiriladigan maydonlar (hemis_id - tabiiy kalit)
+SYNC_FIELDS = {
+    Schedule: ['week_id', 'day_name', 'subject_id', 'lesson_time', 'teacher', 'room', 'training_type'],
+    Attendance: ['subject_id', 'date', 'hours', 'type', 'teacher', 'training_type'],
+    Task: ['subject_id', 'name', 'deadline', 'status', 'grade', 'grade_val', 'max_ball'],
+}
+
+BATCH_SIZE = 500
+
+
+# ---------------------------------------------------------
+# YORDAMCHI FUNKSIYALAR
+# ---------------------------------------------------------
+
+def _to_date(value, default=None):
+    """HEMIS sanasini (timestamp yoki 'YYYY-MM-DD') date obyektiga o'giradi."""
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).date()
+    if isinstance(value, str):
+        try:
+            parsed = parse_date(value[:10])
+        except ValueError:
+            parsed = None
+        if parsed:
+            return parsed
+    return default
+
+
+def _natural_key(item, *parts):
+    """
+    Yozuvning tabiiy kaliti: HEMIS 'id' si bo'lsa o'sha,
+    aks holda asosiy maydonlardan olingan hash.
+    """
+    if item.get('id') is not None:
+        return str(item['id'])
+    raw = '|'.join(str(p) for p in parts)
+    return 'h:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+# data=None - bu qism yangilanmaydi. failed=True - HEMIS javob bermadi (o'zgarmagan emas)
+FetchResult = namedtuple('FetchResult', ['data', 'digest', 'etag', 'last_modified', 'failed'], defaults=[False])
+UNCHANGED = FetchResult(None, None, None, None)
+FAILED = FetchResult(None, None, None, None, failed=True)
+
+
+def _get(path, token, params=None, headers=None):
+    return hemis.get(path, token=token, params=params, headers=headers, timeout=ENDPOINT_TIMEOUTS.get(path, TIMEOUT))
+
+
+def _data(resp):
+    """Javob ma'lumoti. 200 bo'lmasa None (ya'ni bu qism yangilanmaydi)."""
+    if resp.status_code != 200:
+        return None
+    return resp.json().get('data', [])
+
+
+def _fetch(path, token, params=None, fingerprint=None):
+    """
+    Oldingi javob xeshi (fingerprint) bilan solishtiradi: 304 yoki bir xil
+    xesh bo'lsa, JSON umuman parse qilinmaydi.
+    """
+    headers = {}
+    if fingerprint:
+        if fingerprint.etag:
+            headers['If-None-Match'] = fingerprint.etag
+        if fingerprint.last_modified:
+            headers['If-Modified-Since'] = fingerprint.last_modified
+
+    resp = _get(path, token, params, headers)
+    if resp.status_code == 304:
+        return UNCHANGED
+    if resp.status_code != 200:
+        return FAILED
+
+    digest = hashlib.sha256(resp.content).hexdigest()
+    if fingerprint and fingerprint.digest == digest:
+        return UNCHANGED
+    return FetchResult(
+        resp.json().get('data', []), digest,
+        resp.headers.get('ETag'), resp.headers.get('Last-Modified'),
+    )
+
+
+def _fetch_many(requests_map, token, fingerprints):
+    """
+    {path: params} -> {path: FetchResult}. So'rovlar parallel yuboriladi,
+    umumiy vaqt eng sekin endpointga teng bo'ladi.
+    Xato bergan endpoint FAILED qaytaradi, qolganlari saqlanadi.
+    """
+    futures = {
+        path: _fetch_pool.submit(_fetch, path, token, params, fingerprints.get(path))
+        for path, params in requests_map.items()
+    }
+    results = {}
+    for path, future in futures.items():
+        try:
+            results[path] = future.result()
+        except Exception as e:
+            print(f"⚠️ {path} yuklanmadi: {e}")
+            results[path] = FAILED
+    return results
+
+
+def _save_fingerprints(user, sem_code, existing, fetched):
+    to_create, to_update = [], []
+    for path, result in fetched.items():
+        if result.digest is None:
+            continue
+        values = {'digest': result.digest, 'etag': result.etag, 'last_modified': result.last_modified}
+        fp = existing.get(path)
+        if fp is None:
+            to_create.append(SyncFingerprint(user=user, semester_code=sem_code, endpoint=path, **values))
+        else:
+            for f, v in values.items():
+                setattr(fp, f, v)
+            fp.updated_at = timezone.now()
+            to_update.append(fp)
+
+    if to_create:
+        SyncFingerprint.objects.bulk_create(to_create)
+    if to_update:
+        SyncFingerprint.objects.bulk_update(to_update, ['digest', 'etag', 'last_modified', 'updated_at'])
+
+
+def _apply_diff(model, user, semester, rows):
+    """
+    rows: {hemis_id: {maydon: qiymat}}.
+    Mavjud yozuvlar bilan solishtirib, faqat farqlarni yozadi:
+    yangilari bulk_create, o'zgarganlari bulk_update, yo'qolganlari bitta delete.
+    """
+    fields = SYNC_FIELDS[model]
+
+    existing = {}
+    stale_ids = []
+    for obj in model.objects.filter(user=user, semester=semester):
+        if obj.hemis_id in rows and obj.hemis_id not in existing:
+            existing[obj.hemis_id] = obj
+        else:
+            # Eski (kalitsiz) yoki HEMIS dan o'chib ketgan yozuvlar
+            stale_ids.append(obj.id)
+
+    to_create, to_update = [], []
+    for key, values in rows.items():
+        obj = existing.get(key)
+        if obj is None:
+            to_create.append(model(user=user, semester=semester, hemis_id=key, **values))
+        elif any(getattr(obj, f) != v for f, v in values.items()):
+            for f, v in values.items():
+                setattr(obj, f, v)
+            to_update.append(obj)
+
+    if stale_ids:
+        model.objects.filter(id__in=stale_ids).delete()
+    if to_create:
+        model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        model.objects.bulk_update(to_update, fields, batch_size=BATCH_SIZE)
+
+    return len(to_create), len(to_update), len(stale_ids)
+
+
+def _sync_semesters(sem_data):
+    rows = {str(s['code']): {'name': s['name'], 'current': s.get('current', False)} for s in sem_data}
+    existing = semesters.get_many(rows)
+
+    to_create, to_update = [], []
+    for code, values in rows.items():
+        obj = existing.get(code)
+        if obj is None:
+            to_create.append(Semester(code=code, **values))
+        elif obj.name != values['name'] or obj.current != values['current']:
+            # Keshdagi umumiy obyektni o'zgartirmaymiz
+            to_update.append(Semester(id=obj.id, code=code, **values))
+
+    if to_create:
+        Semester.objects.bulk_create(to_create)
+    if to_update:
+        Semester.objects.bulk_update(to_update, ['name', 'current'])
+    if to_create or to_update:
+        semesters.bump()
+
+
+def _sync_weeks(week_rows):
+    """week_rows: {week_id: {'name', 'start_date', 'end_date'}}"""
+    week_rows = {k: v for k, v in week_rows.items() if v['start_date'] and v['end_date']}
+    if not week_rows:
+        return
+    existing = weeks.get_many(week_rows)
 
-API_BASE = "https://student.samdu.uz/rest/v1"
+    to_create, to_update = [], []
+    for week_id, values in week_rows.items():
+        obj = existing.get(week_id)
+        if obj is None:
+            to_create.append(Week(week_id=week_id, **values))
+        elif any(getattr(obj, f) != v for f, v in values.items()):
+            to_update.append(Week(id=obj.id, week_id=week_id, **values))
+
+    if to_create:
+        Week.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        Week.objects.bulk_update(to_update, ['name', 'start_date', 'end_date'], batch_size=BATCH_SIZE)
+    if to_create or to_update:
+        weeks.bump()
+
+
+def _week_row(w):
+    return {
+        'name': w.get('name', ''),
+        'start_date': _to_date(w.get('startDate')),
+        'end_date': _to_date(w.get('endDate')),
+    }
+
+
+# ---------------------------------------------------------
+# PAYLOAD -> QATORLAR
+# ---------------------------------------------------------
+
+def _schedule_rows(items, subject_ids):
+    rows = {}
+    for item in items:
+        week_data = item.get('week', {})
+        week_id = str(week_data.get('id')) if week_data else None
+        day_name = item.get('weekDay', {}).get('name', '')
+        subject_name = item.get('subject', {}).get('name', 'Noma\'lum fan')
+        lesson_time = f"{item.get('lessonPair', {}).get('startTime', '')} - {item.get('lessonPair', {}).get('endTime', '')}"
+
+        key = _natural_key(item, week_id, day_name, subject_name, lesson_time)
+        rows[key] = {
+            'week_id': week_id,
+            'day_name': day_name,
+            'subject_id': subject_ids[subject_name],
+            'lesson_time': lesson_time,
+            'teacher': item.get('employee', {}).get('name', ''),
+            'room': item.get('auditorium', {}).get('name', ''),
+            'training_type': item.get('trainingType', {}).get('name', ''),
+        }
+    return rows
+
+
+def _attendance_rows(items, subject_ids):
+    rows = {}
+    for item in items:
+        subject_name = item.get('subject', {}).get('name', 'Noma\'lum fan')
+        att_date = _to_date(item.get('date'), date(2024, 1, 1))
+        training_type = item.get('trainingType', {}).get('name', '')
+
+        key = _natural_key(item, subject_name, att_date, training_type, item.get('lessonPair', {}).get('id'))
+        rows[key] = {
+            'subject_id': subject_ids[subject_name],
+            'date': att_date,
+            'hours': int(item.get('length', 2) or 0),
+            'type': item.get('attendanceType', {}).get('name', 'Sababsiz'),
+            'teacher': item.get('employee', {}).get('name', ''),
+            'training_type': training_type,
+        }
+    return rows
+
+
+def _task_rows(items, subject_ids):
+    rows = {}
+    for item in items:
+        subject_name = item.get('subject', {}).get('name', 'Fan')
+        name = item.get('name', 'Nazorat ishi')
+        score = item.get('grade', {}).get('score', 0)
+
+        key = _natural_key(item, subject_name, name)
+        rows[key] = {
+            'subject_id': subject_ids[subject_name],
+            'name': name,
+            'deadline': item.get('deadline', ''),
+            'status': item.get('studentStatus', {}).get('name', 'Topshirilmagan'),
+            'grade': str(score),
+            'grade_val': float(score or 0),
+            'max_ball': float(item.get('maxScore', 0) or 0),
+        }
+    return rows
+
+
+def _current_semester_code(sem_data):
+    if sem_data:
+        current = next((s for s in sem_data if s.get('current')), None)
+        if current:
+            return str(current['code'])
+
+    all_sems = sorted(semesters.all(), key=lambda s: s.code, reverse=True)
+    current_sem = next((s for s in all_sems if s.current), None) or next(iter(all_sems), None)
+    return current_sem.code if current_sem else None
+
+
+def _mark_synced(user):
+    user.hemis_synced_at = timezone.now()
+    User.objects.filter(pk=user.pk).update(hemis_synced_at=user.hemis_synced_at)
+
+
+# ---------------------------------------------------------
+# ASOSIY SINXRONIZATSIYA
+# ---------------------------------------------------------
 
 def sync_student_data(user):
 
@@ -12,27 +339,23 @@ def sync_student_data(user):
         print(f"❌ {user.username}: Login yoki parol saqlanmagan.")
         return False
 
-    headers = {'Authorization': f'Bearer {user.hemis_token}'}
-
+    # Semestrlar so'rovi bir vaqtning o'zida token tekshiruvi hamdir.
+    # Muddati tugayotgan token oldindan yangilanadi, 401 faqat kutilmagan holatda.
     try:
-        test_resp = requests.get(f"{API_BASE}/education/semester", headers=headers, timeout=5)
-        
-        if test_resp.status_code == 401:
+        token = ensure_token(user)
+        sem_resp = _get("/education/semester", token) if token else None
+
+        if sem_resp is not None and sem_resp.status_code == 401:
             print(f"🔄 {user.username}: Token eskirgan. Yangilanmoqda...")
-            
-            auth_data = get_auth_token(user.hemis_login, user.hemis_password)
-            
-            if auth_data['success']:
-                new_token = auth_data['token']
-                user.hemis_token = new_token
-                user.save()
-                
-                # Headerni yangilaymiz
-                headers = {'Authorization': f'Bearer {new_token}'}
+
+            token = ensure_token(user, force=True)
+            if token:
                 print(f"✅ {user.username}: Token muvaffaqiyatli yangilandi.")
-            else:
-                print(f"❌ {user.username}: Tokenni yangilab bo'lmadi. Parol o'zgargan bo'lishi mumkin.")
-                return False
+                sem_resp = _get("/education/semester", token)
+
+        if not token:
+            print(f"❌ {user.username}: Tokenni yangilab bo'lmadi. Parol o'zgargan bo'lishi mumkin.")
+            return False
 
     except Exception as e:
         print(f"Internet xatosi: {e}")
@@ -40,120 +363,97 @@ def sync_student_data(user):
 
     # ---------------------------------------------------------
     # AGAR TOKEN ISHLASA, MA'LUMOTLARNI YUKLASHNI BOSHLAYMIZ
+    # Avval hamma narsa parallel yuklab olinadi, keyin bitta
+    # tranzaksiyada faqat farqlar (diff) bazaga yoziladi.
     # ---------------------------------------------------------
-    
+
     try:
-        # 1. SEMESTRLARNI YUKLASH
-        sem_resp = requests.get(f"{API_BASE}/education/semester", headers=headers)
-        if sem_resp.status_code == 200:
-            sem_data = sem_resp.json().get('data', [])
-            for s in sem_data:
-                Semester.objects.update_or_create(
-                    code=str(s['code']),
-                    defaults={'name': s['name'], 'current': s.get('current', False)}
-                )
-
-        # Joriy semestrni aniqlaymiz
-        current_sem = Semester.objects.filter(current=True).first()
-        if not current_sem:
-            current_sem = Semester.objects.order_by('-code').first()
-        
-        if not current_sem:
-            return True 
-        week_resp = requests.get(f"{API_BASE}/education/week", headers=headers)
-        if week_resp.status_code == 200:
-            week_data = week_resp.json().get('data', [])
-            for w in week_data:
-                Week.objects.update_or_create(
-                    week_id=str(w['id']),
-                    defaults={
-                        'name': w['name'],
-                        'start_date': w['startDate'],
-                        'end_date': w['endDate']
-                    }
-                )
-
-        sched_resp = requests.get(f"{API_BASE}/education/schedule", headers=headers, params={'semester': current_sem.code})
-        
-        if sched_resp.status_code == 200:
-            sched_data = sched_resp.json().get('data', [])
-            Schedule.objects.filter(user=user, semester=current_sem).delete()
-            
-            for item in sched_data:
-                subject_name = item.get('subject', {}).get('name', 'Noma\'lum fan')
-                subject, _ = Subject.objects.get_or_create(name=subject_name)
-                
-                week_data = item.get('week', {})
-                week_obj = None
-                if week_data:
-                    try:
-                        week_obj, _ = Week.objects.get_or_create(
-                            week_id=str(week_data.get('id')),
-                            defaults={
-                                'name': week_data.get('name', ''),
-                                'start_date': datetime.fromtimestamp(week_data.get('startDate')),
-                                'end_date': datetime.fromtimestamp(week_data.get('endDate'))
-                            }
-                        )
-                    except:
-                        pass 
-
-                Schedule.objects.create(
-                    user=user,
-                    semester=current_sem,
-                    week_id=str(week_data.get('id')) if week_data else None,
-                    day_name=item.get('weekDay', {}).get('name', ''),
-                    subject=subject,
-                    lesson_time=f"{item.get('lessonPair', {}).get('startTime', '')} - {item.get('lessonPair', {}).get('endTime', '')}",
-                    teacher=item.get('employee', {}).get('name', ''),
-                    room=item.get('auditorium', {}).get('name', ''),
-                    training_type=item.get('trainingType', {}).get('name', '')
-                )
-
-        # 4. DAVOMAT (ATTENDANCE)
-        att_resp = requests.get(f"{API_BASE}/education/attendance", headers=headers, params={'semester': current_sem.code})
-        if att_resp.status_code == 200:
-            att_data = att_resp.json().get('data', [])
-            Attendance.objects.filter(user=user, semester=current_sem).delete()
-            
-            for item in att_data:
-                subject_name = item.get('subject', {}).get('name', 'Noma\'lum fan')
-                subject, _ = Subject.objects.get_or_create(name=subject_name)
-                
-                Attendance.objects.create(
-                    user=user,
-                    semester=current_sem,
-                    subject=subject,
-                    date=item.get('date', '2024-01-01'),
-                    hours=item.get('length', 2),
-                    type=item.get('attendanceType', {}).get('name', 'Sababsiz'),
-                    teacher=item.get('employee', {}).get('name', ''),
-                    training_type=item.get('trainingType', {}).get('name', '')
-                )
-
-        task_resp = requests.get(f"{API_BASE}/education/performance", headers=headers, params={'semester': current_sem.code})
-        if task_resp.status_code == 200:
-            task_data = task_resp.json().get('data', [])
-            Task.objects.filter(user=user, semester=current_sem).delete()
-            
-            for item in task_data:
-                subject_name = item.get('subject', {}).get('name', 'Fan')
-                subject, _ = Subject.objects.get_or_create(name=subject_name)
-                
-                Task.objects.create(
-                    user=user,
-                    semester=current_sem,
-                    subject=subject,
-                    name=item.get('name', 'Nazorat ishi'),
-                    deadline=item.get('deadline', ''),
-                    status=item.get('studentStatus', {}).get('name', 'Topshirilmagan'),
-                    grade=str(item.get('grade', {}).get('score', 0)),
-                    grade_val=float(item.get('grade', {}).get('score', 0) or 0),
-                    max_ball=float(item.get('maxScore', 0) or 0)
-                )
+        sem_data = _data(sem_resp)
+        sem_code = _current_semester_code(sem_data)
+
+        if not sem_code:
+            if sem_data is None:
+                print(f"❌ {user.username}: Hemis semestrlar ro'yxatini qaytarmadi.")
+                return False
+            with transaction.atomic():
+                _sync_semesters(sem_data)
+            _mark_synced(user)
+            return True
+
+        fingerprints = {
+            fp.endpoint: fp for fp in SyncFingerprint.objects.filter(user=user, semester_code=sem_code)
+        }
+        params = {'semester': sem_code}
+        fetched = _fetch_many({
+            "/education/week": None,
+            "/education/schedule": params,
+            "/education/attendance": params,
+            "/education/performance": params,
+        }, token, fingerprints)
+
+        # Hech bir endpoint javob bermagan bo'lsa - sync muvaffaqiyatsiz, hemis_synced_at o'zgarmaydi
+        if sem_data is None and all(result.failed for result in fetched.values()):
+            print(f"❌ {user.username}: Hemis endpointlari javob bermadi.")
+            return False
 
+        # O'zgarmagan javoblar None - ular parse ham, bazaga yozish ham qilinmaydi
+        week_data = fetched["/education/week"].data
+        sched_data = fetched["/education/schedule"].data
+        att_data = fetched["/education/attendance"].data
+        task_data = fetched["/education/performance"].data
+
+        # Haftalar: /week endpointi va jadval ichidagi haftalar
+        week_rows = {}
+        for item in sched_data or []:
+            w = item.get('week') or {}
+            if w.get('id') is not None:
+                week_rows[str(w['id'])] = _week_row(w)
+        for w in week_data or []:
+            week_rows[str(w['id'])] = _week_row(w)
+
+        subject_names = set()
+        for item in sched_data or []:
+            subject_names.add(item.get('subject', {}).get('name', 'Noma\'lum fan'))
+        for item in att_data or []:
+            subject_names.add(item.get('subject', {}).get('name', 'Noma\'lum fan'))
+        for item in task_data or []:
+            subject_names.add(item.get('subject', {}).get('name', 'Fan'))
+
+        try:
+            with transaction.atomic():
+                if sem_data is not None:
+                    _sync_semesters(sem_data)
+                current_sem = semesters.get(sem_code)
+                if not current_sem:
+                    _mark_synced(user)
+                    return True
+
+                _sync_weeks(week_rows)
+                subject_ids = subjects.ids(subject_names)
+
+                changed = False
+                if sched_data is not None:
+                    changed |= any(_apply_diff(Schedule, user, current_sem, _schedule_rows(sched_data, subject_ids)))
+                if att_data is not None:
+                    changed |= any(_apply_diff(Attendance, user, current_sem, _attendance_rows(att_data, subject_ids)))
+                if task_data is not None:
+                    changed |= any(_apply_diff(Task, user, current_sem, _task_rows(task_data, subject_ids)))
+
+                _save_fingerprints(user, sem_code, fingerprints, fetched)
+
+                # Versiya diff bilan bitta tranzaksiyada oshadi - barcha jarayonlar (veb, worker) uni bazadan o'qiydi
+                if changed:
+                    User.objects.filter(pk=user.pk).update(hemis_data_version=F('hemis_data_version') + 1)
+        except Exception:
+            # Bekor qilingan yozuvlar keshda qolib ketmasin
+            for ref in (semesters, weeks, subjects):
+                ref.invalidate()
+            raise
+
+        # Yangi hemis_synced_at jonli (services) keshdagi eski javoblarni ham eskirtiradi
+        _mark_synced(user)
         return True
 
     except Exception as e:
         print(f"Sync jarayonida xatolik: {e}")
-        return False
\ No newline at end of file
+        return False
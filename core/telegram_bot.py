@@ -0,0 +1,171 @@
+# core/telegram_bot.py
+"""
+Telegram bot: /start orqali Hemis akkauntini botga ulash.
+
+Handlerlar create_bot() ichida ro'yxatdan o'tkaziladi, shuning uchun bot
+ikki rejimda ishlaydi:
+  - polling: bot_runner.py (infinity_polling);
+  - webhook: TELEGRAM_WEBHOOK_URL berilsa, Telegram yangilanishlarni Django ga
+    yuboradi (core.views.telegram_webhook), bot_runner esa faqat eslatmalarni
+    yuboradi.
+/start suhbatining qadami (login -> parol) bazada, TelegramConversation da
+saqlanadi - webhook ni istalgan sondagi ASGI worker qabul qilishi mumkin.
+"""
+import hmac
+import os
+import threading
+from datetime import timedelta
+
+import telebot
+from django.db import IntegrityError
+from django.utils import timezone
+
+from .models import User, TelegramUpdate, TelegramConversation
+from .services import get_auth_token
+from .tokens import store_token
+
+# Telegram yangilanishlarni shuncha vaqtdan ko'p saqlamaydi - undan eski update_id lar keraksiz
+UPDATE_RETENTION = timedelta(days=1)
+
+# Shuncha vaqt javob berilmagan /start suhbati eskirgan hisoblanadi
+CONVERSATION_TTL = timedelta(minutes=30)
+
+_webhook_bot = None
+_webhook_bot_lock = threading.Lock()
+
+
+def bot_token():
+    return os.getenv("TELEGRAM_BOT_TOKEN")
+
+
+def webhook_url():
+    return os.getenv("TELEGRAM_WEBHOOK_URL")
+
+
+def webhook_secret():
+    return os.getenv("TELEGRAM_WEBHOOK_SECRET")
+
+
+def create_bot(token=None, threaded=True):
+    bot = telebot.TeleBot(token or bot_token(), threaded=threaded)
+
+    @bot.message_handler(commands=['start'])
+    def send_welcome(message):
+        """1-QADAM: Start bosilganda Login so'raymiz"""
+        bot.reply_to(message, 
+                     "Assalomu alaykum! Hemis AI botiga xush kelibsiz.\n\n"
+                     "🆔 Iltimos, **Hemis loginingizni** (ID raqam) yuboring:")
+        _set_step(message.chat.id, TelegramConversation.STEP_LOGIN)
+
+    @bot.message_handler(func=lambda message: True, content_types=['text'])
+    def continue_conversation(message):
+        """Suhbat qadamini bazadan o'qib, mos bosqichga yo'naltiramiz"""
+        conversation = TelegramConversation.objects.filter(chat_id=message.chat.id).first()
+        if conversation is None:
+            return
+        if conversation.updated_at < timezone.now() - CONVERSATION_TTL:
+            _end_conversation(message.chat.id)
+            bot.send_message(message.chat.id, "Jarayon buzildi. Iltimos /start ni qayta bosing.")
+        elif conversation.step == TelegramConversation.STEP_LOGIN:
+            process_login_step(message)
+        else:
+            process_password_step(message, conversation.login)
+
+    def process_login_step(message):
+        """2-QADAM: Loginni qabul qilib, Parolni so'raymiz"""
+        try:
+            login_input = message.text.strip()
+            _set_step(message.chat.id, TelegramConversation.STEP_PASSWORD, login_input)
+            
+            bot.reply_to(message, f"✅ Login qabul qilindi: {login_input}\n\n🔑 Endi **Hemis parolingizni** yuboring:")
+        except Exception as e:
+            bot.reply_to(message, "Xatolik yuz berdi. Iltimos /start buyrug'ini qayta bosing.")
+
+    def process_password_step(message, login_input):
+        """3-QADAM: Parolni olib, tekshiramiz"""
+        chat_id = message.chat.id
+        try:
+            password_input = message.text.strip()
+            # Suhbat shu yerda tugaydi - natijadan qat'i nazar
+            _end_conversation(chat_id)
+            
+            try:
+                bot.delete_message(chat_id, message.message_id)
+            except Exception:
+                pass 
+
+            bot.send_message(chat_id, "⏳ Tekshirilmoqda... (Parolingiz xavfsizlik uchun o'chirildi)")
+            
+            auth_resp = get_auth_token(login_input, password_input)
+            
+            if auth_resp['success']:
+                try:
+                    user = User.objects.get(username=login_input)
+                    user.telegram_chat_id = str(chat_id)
+                    # Tekshiruvda olingan yangi tokenni ham saqlaymiz (keyingi sync login qilmaydi)
+                    store_token(user, auth_resp['token'], save=False)
+                    user.save()
+                    bot.send_message(chat_id, f"✅ Muvaffaqiyatli ulandiz, **{user.full_name}**!\n\n"
+                                              "Endi sizga:\n"
+                                              "1. Topshiriq muddati tugashiga 1 kun va 2 soat qolganda eslatma boradi.\n"
+                                              "2. NB (qoldirilgan darslar) 5 taga yetsa ogohlantirish boradi.")
+                except User.DoesNotExist:
+                    bot.send_message(chat_id, "❌ Siz avval Hemis AI saytiga kirishingiz kerak.")
+            else:
+                bot.send_message(chat_id, "❌ Login yoki parol noto'g'ri. /start ni bosing.")
+                
+        except Exception as e:
+            bot.send_message(chat_id, f"Tizim xatoligi: {str(e)}")
+
+    return bot
+
+
+def _set_step(chat_id, step, login=''):
+    TelegramConversation.objects.update_or_create(chat_id=chat_id, defaults={'step': step, 'login': login})
+
+
+def _end_conversation(chat_id):
+    TelegramConversation.objects.filter(chat_id=chat_id).delete()
+
+
+def get_webhook_bot():
+    """Webhook uchun yagona bot: handlerlar so'rovning o'zida bajariladi (threaded=False)."""
+    global _webhook_bot
+    with _webhook_bot_lock:
+        if _webhook_bot is None:
+            _webhook_bot = create_bot(threaded=False)
+        return _webhook_bot
+
+
+def verify_secret(received):
+    """X-Telegram-Bot-Api-Secret-Token sarlavhasini sozlamadagi sir bilan solishtiradi."""
+    secret = webhook_secret()
+    return bool(secret) and hmac.compare_digest((received or '').encode(), secret.encode())
+
+
+def claim_update(update_id):
+    """update_id ni band qiladi. Yangilanish allaqachon qabul qilingan bo'lsa - False."""
+    try:
+        _, created = TelegramUpdate.objects.get_or_create(update_id=update_id)
+    except IntegrityError:
+        return False
+    return created
+
+
+def release_update(update_id):
+    """Qayta ishlash xato bilan tugadi - Telegram qayta yuborganda yana qabul qilinadi."""
+    TelegramUpdate.objects.filter(update_id=update_id).delete()
+
+
+def prune_updates():
+    """Eski update_id lar va tashlab ketilgan /start suhbatlarini o'chiradi."""
+    now = timezone.now()
+    deleted, _ = TelegramUpdate.objects.filter(received_at__lt=now - UPDATE_RETENTION).delete()
+    abandoned, _ = TelegramConversation.objects.filter(updated_at__lt=now - CONVERSATION_TTL).delete()
+    return deleted + abandoned
+
+
+def process_update(data):
+    """Webhook orqali kelgan bitta yangilanishni (JSON dict) qayta ishlaydi."""
+    update = telebot.types.Update.de_json(data)
+    get_webhook_bot().process_new_updates([update])
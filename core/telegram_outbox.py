@@ -0,0 +1,217 @@
+# core/telegram_outbox.py
+"""
+Telegram ga chiquvchi xabarlar navbati.
+
+Bildirishnoma tayyorlovchi kod xabarni submit() bilan navbatga qo'yadi va
+darhol keyingisiga o'tadi; yuborishni kichik worker pool bajaradi:
+  - umumiy limit: sekundiga TELEGRAM_GLOBAL_RATE ta xabar (Telegram ~30/s);
+  - har bir chat uchun: sekundiga TELEGRAM_CHAT_RATE ta xabar;
+  - 429 javobida `retry_after` kutib max_throttles marta, tarmoq xatolarida
+    backoff bilan max_retries marta qayta urinadi;
+  - yetkazilganda on_success, vaqtinchalik xato bilan yetkazilmaganda
+    on_failure, Telegram rad etganda (4xx: bot bloklangan, chat topilmadi
+    va h.k. - qayta yuborishdan foyda yo'q) on_rejected chaqiriladi.
+Chat limiti band bo'lsa worker kutib turmaydi - xabar keyinroq navbatga qaytadi.
+Navbat faqat xotirada: jarayon to'xtashidan oldin shutdown() chaqiriladi -
+u navbat bo'shashini kutadi, yuborilmay qolgan xabarlar uchun on_failure chaqiradi.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .hemis import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+_GLOBAL = 'global'
+
+
+class _Message:
+    __slots__ = (
+        'chat_id', 'text', 'kwargs', 'on_failure', 'on_success', 'on_rejected', 'attempts', 'throttles', 'queued_at',
+    )
+
+    def __init__(self, chat_id, text, kwargs, on_failure, on_success, on_rejected):
+        self.chat_id = str(chat_id)
+        self.text = text
+        self.kwargs = kwargs
+        self.on_failure = on_failure
+        self.on_success = on_success
+        self.on_rejected = on_rejected
+        self.attempts = 0
+        self.throttles = 0
+        self.queued_at = time.monotonic()
+
+
+def _retry_after(error):
+    """429 (Too Many Requests) bo'lsa Telegram so'ragan kutish vaqti, aks holda None."""
+    if getattr(error, 'error_code', None) != 429:
+        return None
+    parameters = (getattr(error, 'result_json', None) or {}).get('parameters') or {}
+    return float(parameters.get('retry_after', 1))
+
+
+def _is_permanent(error):
+    # Telegram javob qaytargan 4xx xatolar (bot bloklangan, chat topilmadi...) qayta urinishdan foyda yo'q
+    code = getattr(error, 'error_code', None)
+    return code is not None and 400 <= code < 500
+
+
+class TelegramOutbox:
+    def __init__(self, send, workers=None, global_rate=None, chat_rate=None, max_retries=3, max_throttles=5):
+        self.send = send
+        self.workers = workers or settings.TELEGRAM_SEND_WORKERS
+        self.max_retries = max_retries
+        self.max_throttles = max_throttles
+        self._global_limiter = HostRateLimiter(global_rate or settings.TELEGRAM_GLOBAL_RATE)
+        self._chat_limiter = HostRateLimiter(chat_rate or settings.TELEGRAM_CHAT_RATE, burst=1)
+        self._heap = []  # (yuborish vaqti, tartib raqami, _Message)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._closed = False
+        self._threads = []
+        self._latency_total = 0.0
+        self.metrics = Counter()
+
+    def submit(self, chat_id, text, on_failure=None, on_success=None, on_rejected=None, **kwargs):
+        """
+        Xabarni navbatga qo'yadi. on_success() - xabar yetkazilganda,
+        on_failure() - vaqtinchalik sabab bilan yetkazilmay qolsa (shu jumladan
+        navbat yopilganda), on_rejected() - Telegram xabarni rad etganda
+        chaqiriladi (berilmasa, o'rniga on_failure).
+        """
+        msg = _Message(chat_id, text, kwargs, on_failure, on_success, on_rejected)
+        with self._cond:
+            if not self._closed:
+                self._start_workers()
+                self._push(msg, 0)
+                self._pending += 1
+                self.metrics['queued'] += 1
+                return
+            self.metrics['dropped'] += 1
+        self._callback(msg, msg.on_failure)
+
+    def join(self, timeout=None):
+        """Navbatdagi barcha xabarlar yuborilguncha (yoki yakuniy xato bilan tugaguncha) kutadi."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self, timeout=None):
+        """
+        Navbatni yopadi: timeout soniyagacha xabarlar yuborilishini kutadi, keyin
+        yuborilmay qolganlarini navbatdan olib, ular uchun on_failure chaqiradi.
+        Tashlab yuborilgan xabarlar sonini qaytaradi.
+        """
+        self.join(timeout)
+        with self._cond:
+            self._closed = True
+            dropped = [entry[2] for entry in self._heap]
+            self._heap.clear()
+        for msg in dropped:
+            self._callback(msg, msg.on_failure)
+            self._done(msg, 'dropped')
+        return len(dropped)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.metrics, pending=self._pending)
+            sent = self.metrics['sent']
+            stats['avg_latency'] = round(self._latency_total / sent, 2) if sent else 0.0
+            return stats
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f'tg-outbox-{len(self._threads)}', daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _push(self, msg, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), msg))
+        self._cond.notify()
+
+    def _reschedule(self, msg, delay, metric):
+        with self._cond:
+            if not self._closed:
+                self.metrics[metric] += 1
+                self._push(msg, delay)
+                return
+        # Navbat yopilgan - qayta urinish bo'lmaydi
+        self._callback(msg, msg.on_failure)
+        self._done(msg, 'dropped')
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)[2]
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _done(self, msg, status):
+        with self._cond:
+            self.metrics[status] += 1
+            if status == 'sent':
+                self._latency_total += time.monotonic() - msg.queued_at
+            self._pending -= 1
+            if self._pending == 0:
+                # Navbat bo'sh - chatlar bo'yicha bucket larni saqlab turish shart emas
+                self._chat_limiter.clear()
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            msg = self._next()
+            wait = self._chat_limiter.try_acquire(msg.chat_id)
+            if wait:
+                self._reschedule(msg, wait, 'chat_limited')
+                continue
+            self._global_limiter.acquire(_GLOBAL)
+            self._deliver(msg)
+
+    def _deliver(self, msg):
+        try:
+            self.send(msg.chat_id, msg.text, **msg.kwargs)
+        except Exception as e:
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                # 429 da ham urinishlar cheklangan - aks holda xabar navbatda cheksiz aylanadi
+                msg.throttles += 1
+                if msg.throttles <= self.max_throttles:
+                    self._reschedule(msg, retry_after, 'throttled')
+                    return
+            elif _is_permanent(e):
+                logger.warning(f"Telegram xabarni rad etdi (chat={msg.chat_id}): {e}")
+                self._callback(msg, msg.on_rejected or msg.on_failure)
+                self._done(msg, 'rejected')
+                return
+            else:
+                msg.attempts += 1
+                if msg.attempts <= self.max_retries:
+                    self._reschedule(msg, 2 ** msg.attempts, 'retried')
+                    return
+            logger.warning(f"Telegram xabari yuborilmadi (chat={msg.chat_id}): {e}")
+            self._callback(msg, msg.on_failure)
+            self._done(msg, 'failed')
+            return
+        self._callback(msg, msg.on_success)
+        self._done(msg, 'sent')
+
+    def _callback(self, msg, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Outbox callback xatosi (chat={msg.chat_id}): {e}")
+        finally:
+            close_old_connections()
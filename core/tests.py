@@ -0,0 +1,556 @@
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qsl, urlsplit
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from telebot import apihelper
+
+from .lookups import ReferenceCache, semesters, subjects, weeks
+from . import services, sync, telegram_bot
+from .models import (
+    User, Semester, Subject, Week, Schedule, Attendance, Task, NotificationLog, TelegramUpdate, TelegramConversation,
+    SyncFingerprint,
+)
+from .notifications import claim_notifications, mark_delivered, release_stale_claims
+from .telegram_outbox import TelegramOutbox
+
+
+class HemisViewTests(TestCase):
+    """Hemis sahifasi: so'rovlar soni ma'lumot hajmiga bog'liq bo'lmasligi kerak."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='talaba', password='x')
+        cls.semester = Semester.objects.create(code='11', name='1-semestr', current=True)
+        subjects = Subject.objects.bulk_create([Subject(name=f"Fan {i}") for i in range(5)])
+
+        today = date.today()
+        cls.weeks = Week.objects.bulk_create([
+            Week(week_id=str(100 + i), name=f"{i + 1}-hafta",
+                 start_date=today + timedelta(weeks=i - 1, days=-today.weekday()),
+                 end_date=today + timedelta(weeks=i - 1, days=6 - today.weekday()))
+            for i in range(3)
+        ])
+        days = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma"]
+        Schedule.objects.bulk_create([
+            Schedule(user=cls.user, semester=cls.semester, hemis_id=str(i), week_id=cls.weeks[i % 3].week_id,
+                     day_name=days[i % 5], subject=subjects[i % 5], lesson_time=f"{8 + i % 4}:00")
+            for i in range(60)
+        ])
+        Attendance.objects.bulk_create([
+            Attendance(user=cls.user, semester=cls.semester, hemis_id=str(i), subject=subjects[i % 5],
+                       date=today - timedelta(days=i), hours=2, type='Sababsiz' if i % 2 else 'Sababli')
+            for i in range(80)
+        ])
+        Task.objects.bulk_create([
+            Task(user=cls.user, semester=cls.semester, hemis_id=str(i), subject=subjects[i % 5],
+                 name=f"Topshiriq {i}", deadline='', status='Topshirilmagan')
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        semesters.invalidate()
+        weeks.invalidate()
+        self.client.force_login(self.user)
+
+    def _add_rows(self, n):
+        subject = Subject.objects.first()
+        Schedule.objects.bulk_create([
+            Schedule(user=self.user, semester=self.semester, hemis_id=f"x{i}", week_id=self.weeks[1].week_id,
+                     day_name="Shanba", subject=subject, lesson_time="14:00")
+            for i in range(n)
+        ])
+        Attendance.objects.bulk_create([
+            Attendance(user=self.user, semester=self.semester, hemis_id=f"x{i}", subject=subject,
+                       date=date.today(), hours=2, type='Sababsiz')
+            for i in range(n)
+        ])
+        Task.objects.bulk_create([
+            Task(user=self.user, semester=self.semester, hemis_id=f"x{i}", subject=subject,
+                 name=f"Qo'shimcha {i}", deadline='', status='Topshirilmagan')
+            for i in range(n)
+        ])
+
+    def test_query_count(self):
+        # session, user, semestrlar (versiya + jadval), haftalar ro'yxati, haftalar
+        # (versiya + jadval), sync holati, jadval, davomat statistikasi,
+        # davomat sahifasi, topshiriqlar
+        with self.assertNumQueries(12):
+            response = self.client.get(reverse('hemis_data'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_data(self):
+        self._add_rows(200)
+        with self.assertNumQueries(12):
+            self.client.get(reverse('hemis_data'))
+
+    def test_cached_fragments_skip_data_queries(self):
+        self.client.get(reverse('hemis_data'))
+        # Fragmentlar keshda: faqat session, user, haftalar ro'yxati, davomat
+        # statistikasi (sahifa raqami kesh kalitida) va sync holati
+        with self.assertNumQueries(5):
+            self.client.get(reverse('hemis_data'))
+
+    def test_arbitrary_attendance_page_values_reuse_fragments(self):
+        # Paginator.get_page: son bo'lmagan qiymat - 1-sahifa, diapazondan tashqari - oxirgi sahifa
+        self.client.get(reverse('hemis_data'))
+        self.client.get(reverse('hemis_data'), {'att_page': '999999'})
+        for att_page in ['abc', '1.5', '0', '-1', '123456']:
+            with self.assertNumQueries(5):
+                self.client.get(reverse('hemis_data'), {'att_page': att_page})
+
+    def test_cached_fragments_follow_data_version(self):
+        self.client.get(reverse('hemis_data'))
+        Task.objects.bulk_create([Task(user=self.user, semester=self.semester, hemis_id='new', subject=Subject.objects.first(),
+                                       name="Yangi topshiriq", deadline='', status='Topshirilmagan')])
+        # Boshqa jarayondagi sync versiyani faqat bazada oshiradi
+        User.objects.filter(pk=self.user.pk).update(hemis_data_version=F('hemis_data_version') + 1)
+        self.assertContains(self.client.get(reverse('hemis_data')), "Yangi topshiriq")
+
+    def test_unknown_week_falls_back_to_current_week(self):
+        response = self.client.get(reverse('hemis_data'), {'week': '999'})
+        self.assertEqual(response.context['selected_week_id'], self.weeks[1].week_id)
+        self.assertTrue(response.context['hemis'].schedule)
+
+
+class ReferenceCacheTests(TestCase):
+    def test_sees_changes_made_by_other_processes(self):
+        # Veb-jarayondagi nusxa; o'zgarishlarni sync_worker jarayoni bulk yozuvlar bilan qiladi
+        web = ReferenceCache(Semester, 'code', check_interval=0)
+        self.assertEqual(web.all(), [])
+
+        Semester.objects.bulk_create([Semester(code='11', name='1-semestr', current=True)])
+        semesters.bump()
+        self.assertEqual([s.code for s in web.all()], ['11'])
+
+        Semester.objects.filter(code='11').update(current=False)
+        semesters.bump()
+        self.assertFalse(web.all()[0].current)
+
+        # Versiya o'zgarmagan - faqat versiya tekshiriladi, jadval qayta yuklanmaydi
+        with self.assertNumQueries(1):
+            web.all()
+
+    def test_version_check_is_throttled(self):
+        lookup = ReferenceCache(Semester, 'code', check_interval=60)
+        lookup.all()
+        with self.assertNumQueries(0):
+            lookup.all()
+            lookup.version()
+
+
+class _JsonResponse:
+    """hemis.get() javobining o'rnini bosuvchi."""
+
+    def __init__(self, data, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return json.dumps(self.data).encode('utf-8')
+
+    def json(self):
+        return self.data
+
+
+class SyncTests(TestCase):
+    """sync_student_data: diff (yaratish/yangilash/o'chirish) va hemis_data_version."""
+
+    def setUp(self):
+        for ref in (semesters, weeks, subjects):
+            ref.invalidate()
+        self.user = User.objects.create_user(
+            username='talaba', password='x', hemis_login='talaba', hemis_password='parol',
+            hemis_token='token', hemis_token_expires_at=timezone.now() + timedelta(days=1),
+        )
+        self.payload = {
+            '/education/semester': [{'code': 11, 'name': '1-semestr', 'current': True}],
+            '/education/week': [{'id': 100, 'name': '1-hafta', 'startDate': '2024-02-05', 'endDate': '2024-02-11'}],
+            '/education/schedule': [
+                {'id': i, 'week': {'id': 100}, 'weekDay': {'name': 'Dushanba'}, 'subject': {'name': f"Fan {i % 3}"},
+                 'lessonPair': {'startTime': f"{8 + i}:00", 'endTime': f"{9 + i}:20"}}
+                for i in range(6)
+            ],
+            '/education/attendance': [
+                {'id': i, 'subject': {'name': f"Fan {i % 3}"}, 'date': f"2024-02-0{i + 1}", 'length': 2,
+                 'attendanceType': {'name': 'Sababsiz'}}
+                for i in range(4)
+            ],
+            '/education/performance': [
+                {'id': i, 'subject': {'name': f"Fan {i % 3}"}, 'name': f"Nazorat {i}", 'grade': {'score': 50 + i}}
+                for i in range(3)
+            ],
+        }
+        self.status_code = 200
+        patcher = mock.patch.object(sync.hemis, 'get', side_effect=self._get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, path, **kwargs):
+        return _JsonResponse({'success': True, 'data': self.payload[path]}, status_code=self.status_code)
+
+    def _sync(self):
+        result = sync.sync_student_data(self.user)
+        self.user.refresh_from_db()
+        return result
+
+    def _counts(self):
+        return tuple(model.objects.filter(user=self.user).count() for model in (Schedule, Attendance, Task))
+
+    def test_first_sync_creates_rows(self):
+        self.assertTrue(self._sync())
+        self.assertEqual(self._counts(), (6, 4, 3))
+        self.assertEqual(self.user.hemis_data_version, 2)
+        self.assertIsNotNone(self.user.hemis_synced_at)
+
+    def test_identical_payload_changes_nothing(self):
+        self._sync()
+        ids = set(Schedule.objects.values_list('id', flat=True))
+        # Fingerprintlarsiz ham: javoblar to'liq qayta solishtiriladi, lekin hech narsa yozilmaydi
+        for drop_fingerprints in (False, True):
+            if drop_fingerprints:
+                SyncFingerprint.objects.all().delete()
+            self.assertTrue(self._sync())
+            self.assertEqual(self._counts(), (6, 4, 3))
+            self.assertEqual(self.user.hemis_data_version, 2)
+            self.assertEqual(set(Schedule.objects.values_list('id', flat=True)), ids)
+
+    def test_changed_payload_updates_rows(self):
+        self._sync()
+        self.payload['/education/performance'][0]['grade'] = {'score': 99}
+        self.payload['/education/attendance'].append(
+            {'id': 10, 'subject': {'name': 'Fan 0'}, 'date': '2024-02-09', 'length': 4})
+
+        self.assertTrue(self._sync())
+        self.assertEqual(self._counts(), (6, 5, 3))
+        self.assertEqual(Task.objects.get(user=self.user, hemis_id='0').grade_val, 99)
+        self.assertEqual(self.user.hemis_data_version, 3)
+
+    def test_shrunk_payload_deletes_rows(self):
+        self._sync()
+        self.payload['/education/schedule'] = self.payload['/education/schedule'][:2]
+
+        self.assertTrue(self._sync())
+        self.assertEqual(self._counts(), (2, 4, 3))
+        self.assertEqual(set(Schedule.objects.values_list('hemis_id', flat=True)), {'0', '1'})
+        self.assertEqual(self.user.hemis_data_version, 3)
+
+    def test_apply_diff_counts(self):
+        self._sync()
+        semester = Semester.objects.get(code='11')
+        subject_id = Subject.objects.get(name='Fan 0').id
+        rows = {
+            str(i): {'subject_id': subject_id, 'name': f"Nazorat {i}", 'deadline': '', 'status': 'Topshirilmagan',
+                     'grade': '0', 'grade_val': 0.0, 'max_ball': 0.0}
+            for i in range(3)
+        }
+        # Barcha 3 ta yozuv o'zgardi (fan, nom va baho boshqa)
+        self.assertEqual(sync._apply_diff(Task, self.user, semester, rows), (0, 3, 0))
+        self.assertEqual(sync._apply_diff(Task, self.user, semester, rows), (0, 0, 0))
+        rows['0']['grade_val'] = 5.0
+        rows['9'] = dict(rows['1'])
+        del rows['2']
+        self.assertEqual(sync._apply_diff(Task, self.user, semester, rows), (1, 1, 1))
+        self.assertEqual(set(Task.objects.filter(user=self.user).values_list('hemis_id', flat=True)), {'0', '1', '9'})
+
+    def test_failed_endpoints_keep_synced_at(self):
+        self._sync()
+        synced_at = self.user.hemis_synced_at
+        self.status_code = 500
+        self.assertFalse(self._sync())
+        self.assertEqual(self.user.hemis_synced_at, synced_at)
+        self.assertEqual(self.user.hemis_data_version, 2)
+
+
+class HemisServicesCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='talaba', password='x')
+
+    def test_failed_attendance_is_not_cached(self):
+        with mock.patch.object(services.hemis, 'get', return_value=_JsonResponse({'success': False})) as get:
+            self.assertFalse(services.get_attendance(self.user, '11')['success'])
+            services.get_attendance(self.user, '11')
+        self.assertEqual(get.call_count, 2)
+
+        with mock.patch.object(services.hemis, 'get', return_value=_JsonResponse({'success': True, 'data': []})) as get:
+            self.assertTrue(services.get_attendance(self.user, '11')['success'])
+            services.get_attendance(self.user, '11')
+        self.assertEqual(get.call_count, 1)
+
+
+class _TooManyRequests(Exception):
+    error_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__('Too Many Requests')
+        self.result_json = {'parameters': {'retry_after': retry_after}}
+
+
+def _throttled_send(retry_after):
+    def send(chat_id, text, **kwargs):
+        raise _TooManyRequests(retry_after)
+    return send
+
+
+class TelegramOutboxTests(SimpleTestCase):
+    def _outbox(self, send, **kwargs):
+        return TelegramOutbox(send, workers=2, global_rate=1000, chat_rate=kwargs.pop('chat_rate', 1000), **kwargs)
+
+    def test_throttle_retries_are_capped(self):
+        failed = []
+        outbox = self._outbox(_throttled_send(0), max_throttles=3)
+        with self.assertLogs('core.telegram_outbox', 'WARNING'):
+            outbox.submit(1, 'salom', on_failure=lambda: failed.append(1))
+            self.assertTrue(outbox.join(5))
+        self.assertEqual(failed, [1])
+        self.assertEqual(outbox.stats()['throttled'], 3)
+        self.assertEqual(outbox.stats()['failed'], 1)
+
+    def test_rejected_messages_are_not_retried(self):
+        calls, failed, rejected = [], [], []
+
+        class _Blocked(Exception):
+            error_code = 403
+
+        def send(chat_id, text):
+            calls.append(text)
+            raise _Blocked('Forbidden: bot was blocked by the user')
+
+        outbox = self._outbox(send)
+        with self.assertLogs('core.telegram_outbox', 'WARNING'):
+            outbox.submit(1, 'salom', on_failure=lambda: failed.append(1), on_rejected=lambda: rejected.append(1))
+            self.assertTrue(outbox.join(5))
+        self.assertEqual((calls, failed, rejected), (['salom'], [], [1]))
+        self.assertEqual(outbox.stats()['rejected'], 1)
+
+    def test_transient_errors_release_the_message(self):
+        failed, rejected = [], []
+
+        def send(chat_id, text):
+            raise ConnectionError('tarmoq xatosi')
+
+        outbox = self._outbox(send, max_retries=0)
+        with self.assertLogs('core.telegram_outbox', 'WARNING'):
+            outbox.submit(1, 'salom', on_failure=lambda: failed.append(1), on_rejected=lambda: rejected.append(1))
+            self.assertTrue(outbox.join(5))
+        self.assertEqual((failed, rejected), ([1], []))
+        self.assertEqual(outbox.stats()['failed'], 1)
+
+    def test_chat_limit_reschedules_are_counted(self):
+        sent = []
+        outbox = self._outbox(lambda chat_id, text: sent.append(text), chat_rate=20)
+        for i in range(3):
+            outbox.submit(1, str(i), on_success=lambda: None)
+        self.assertTrue(outbox.join(5))
+        self.assertEqual(sorted(sent), ['0', '1', '2'])
+        self.assertGreater(outbox.stats()['chat_limited'], 0)
+
+    def test_shutdown_fails_unsent_messages(self):
+        failed, delivered = [], []
+        outbox = self._outbox(_throttled_send(60))
+        outbox.submit(1, 'salom', on_failure=lambda: failed.append(1), on_success=lambda: delivered.append(1))
+        self.assertFalse(outbox.join(0.2))
+
+        self.assertEqual(outbox.shutdown(timeout=0), 1)
+        self.assertEqual((failed, delivered), ([1], []))
+        self.assertEqual(outbox.stats()['pending'], 0)
+
+        # Yopilgan navbatga qo'yilgan xabar darhol yetkazilmagan hisoblanadi
+        outbox.submit(2, 'salom', on_failure=lambda: failed.append(2))
+        self.assertEqual(failed, [1, 2])
+
+
+class NotificationClaimTests(TestCase):
+    def test_stale_undelivered_claims_are_released(self):
+        user = User.objects.create_user(username='talaba', password='x')
+        claimed = claim_notifications([(user.id, 'yuborildi'), (user.id, 'yuborilmadi'), (user.id, 'yangi')])
+        self.assertEqual(len(claimed), 3)
+        mark_delivered(user.id, 'yuborildi')
+        NotificationLog.objects.exclude(notification_key='yangi').update(
+            sent_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(release_stale_claims(timeout=30 * 60), 1)
+        self.assertEqual(
+            set(NotificationLog.objects.values_list('notification_key', flat=True)), {'yuborildi', 'yangi'})
+        # Bandi bekor qilingan eslatma keyingi tekshiruvda qayta band qilinadi
+        self.assertEqual(claim_notifications([(user.id, 'yuborilmadi')]), {(user.id, 'yuborilmadi')})
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """Bot API o'rnini bosuvchi lokal server: chaqiruvlarni yozib boradi va muvaffaqiyatli javob qaytaradi."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _FakeTelegramHandler)
+        self.calls = []
+        self._message_ids = iter(range(1, 1_000_000))
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/bot{{0}}/{{1}}"
+
+    def record(self, method, params):
+        with self._lock:
+            self.calls.append((method, params))
+            message_id = next(self._message_ids)
+        if method == 'sendMessage':
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
+
+    def sent_texts(self):
+        return [params.get('text', '') for method, params in self.calls if method == 'sendMessage']
+
+
+class _FakeTelegramHandler(BaseHTTPRequestHandler):
+    def _handle(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode('utf-8')))
+        result = self.server.record(url.path.rsplit('/', 1)[-1], params)
+
+        body = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramWebhookTests(TestCase):
+    """Telegram webhook: sir token, update_id bo'yicha takrorlanmaslik va /start suhbati (soxta Bot API bilan)."""
+
+    SECRET = 'test-secret'
+    CHAT_ID = 900_000_001
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeTelegramServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.server.calls.clear()
+        env = {'TELEGRAM_BOT_TOKEN': '123456:FAKE', 'TELEGRAM_WEBHOOK_SECRET': self.SECRET}
+        for patcher in (
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(apihelper, 'API_URL', self.server.api_url),
+            mock.patch.object(telegram_bot, '_webhook_bot', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.url = reverse('telegram_webhook')
+
+    def post(self, update, token=SECRET):
+        return self.client.post(
+            self.url, data=json.dumps(update), content_type='application/json',
+            headers={'X-Telegram-Bot-Api-Secret-Token': token},
+        )
+
+    def message_update(self, update_id, text):
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': self.CHAT_ID, 'type': 'private'},
+            'from': {'id': self.CHAT_ID, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        return {'update_id': update_id, 'message': message}
+
+    def test_rejects_wrong_secret(self):
+        self.assertEqual(self.post(self.message_update(1, '/start'), token='wrong').status_code, 403)
+        self.assertFalse(TelegramUpdate.objects.exists())
+
+    def test_rejects_malformed_json(self):
+        response = self.client.post(
+            self.url, data='{', content_type='application/json',
+            headers={'X-Telegram-Bot-Api-Secret-Token': self.SECRET},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_start_conversation(self):
+        self.assertEqual(self.post(self.message_update(1, '/start')).status_code, 200)
+        self.assertTrue(any('Hemis loginingizni' in text for text in self.server.sent_texts()))
+
+        self.assertEqual(self.post(self.message_update(2, 'test_login')).status_code, 200)
+        self.assertTrue(any('Login qabul qilindi' in text for text in self.server.sent_texts()))
+        self.assertEqual(set(TelegramUpdate.objects.values_list('update_id', flat=True)), {1, 2})
+
+    def test_conversation_continues_on_another_worker(self):
+        user = User.objects.create_user(username='talaba', password='x', full_name='Test Talaba')
+        self.assertEqual(self.post(self.message_update(1, '/start')).status_code, 200)
+
+        # Keyingi yangilanishlar boshqa workerga tushadi: yangi bot, jarayon xotirasi bo'sh
+        telegram_bot._webhook_bot = None
+        self.assertEqual(self.post(self.message_update(2, 'talaba')).status_code, 200)
+        self.assertEqual(TelegramConversation.objects.get(chat_id=self.CHAT_ID).login, 'talaba')
+
+        telegram_bot._webhook_bot = None
+        auth = {'success': True, 'token': 'token'}
+        with mock.patch.object(telegram_bot, 'get_auth_token', return_value=auth) as get_auth_token:
+            self.assertEqual(self.post(self.message_update(3, 'parol')).status_code, 200)
+        get_auth_token.assert_called_once_with('talaba', 'parol')
+
+        user.refresh_from_db()
+        self.assertEqual(user.telegram_chat_id, str(self.CHAT_ID))
+        self.assertTrue(any('Muvaffaqiyatli ulandiz' in text for text in self.server.sent_texts()))
+        self.assertFalse(TelegramConversation.objects.exists())
+
+    def test_messages_outside_conversation_are_ignored(self):
+        self.assertEqual(self.post(self.message_update(1, 'salom')).status_code, 200)
+        self.assertEqual(self.server.sent_texts(), [])
+
+    def test_stale_conversation_is_restarted(self):
+        self.post(self.message_update(1, '/start'))
+        TelegramConversation.objects.update(updated_at=timezone.now() - telegram_bot.CONVERSATION_TTL * 2)
+        self.post(self.message_update(2, 'talaba'))
+        self.assertTrue(any('Jarayon buzildi' in text for text in self.server.sent_texts()))
+        self.assertFalse(TelegramConversation.objects.exists())
+
+    def test_duplicate_update_is_not_reprocessed(self):
+        start = self.message_update(1, '/start')
+        self.assertEqual(self.post(start).status_code, 200)
+        calls = len(self.server.calls)
+
+        self.assertEqual(self.post(start).status_code, 200)
+        self.assertEqual(len(self.server.calls), calls)
+
+    def test_failed_update_is_released_for_retry(self):
+        with mock.patch.object(telegram_bot, 'process_update', side_effect=RuntimeError('xato')), \
+                self.assertLogs('core.views', 'ERROR') as logs:
+            self.assertEqual(self.post(self.message_update(1, '/start')).status_code, 500)
+        self.assertIn('update_id=1', logs.output[0])
+        self.assertIn('RuntimeError', logs.output[0])
+        self.assertFalse(TelegramUpdate.objects.exists())
+
+        # Telegram qayta yuborganda yangilanish endi qayta ishlanadi
+        self.assertEqual(self.post(self.message_update(1, '/start')).status_code, 200)
+        self.assertTrue(any('Hemis loginingizni' in text for text in self.server.sent_texts()))
@@ -0,0 +1,88 @@
+# core/tokens.py
+"""
+HEMIS tokenlarining hayot sikli.
+
+Token bilan birga uning berilgan va tugash vaqti saqlanadi. Sync boshlanishidan
+oldin token muddati tugayotgan bo'lsa, u oldindan yangilanadi - shuning uchun
+401 olib, qayta login qilish uchun ortiqcha so'rov ketmaydi.
+
+Yangilash "single-flight": bir foydalanuvchi uchun bir vaqtda faqat bitta
+login so'rovi yuboriladi (jarayon ichida lock, jarayonlar orasida esa
+User qatoriga SELECT ... FOR UPDATE). Qolganlar tayyor tokenni oladi.
+"""
+import base64
+import json
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import User
+from .services import get_auth_token
+
+TOKEN_FIELDS = ['hemis_token', 'hemis_token_issued_at', 'hemis_token_expires_at']
+
+# Har bir user uchun alohida lock saqlamaslik uchun "striped" lock lar
+_LOCK_STRIPES = 64
+_refresh_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+def _jwt_expiry(token):
+    """JWT bo'lsa 'exp' maydonini qaytaradi, aks holda None."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return datetime.fromtimestamp(int(exp), tz=dt_timezone.utc) if exp else None
+    except Exception:
+        return None
+
+
+def store_token(user, token, save=True):
+    """Yangi tokenni berilgan/tugash vaqtlari bilan birga yozadi."""
+    now = timezone.now()
+    user.hemis_token = token
+    user.hemis_token_issued_at = now
+    user.hemis_token_expires_at = _jwt_expiry(token) or now + timedelta(seconds=settings.HEMIS_TOKEN_TTL)
+    if save:
+        User.objects.filter(pk=user.pk).update(**{f: getattr(user, f) for f in TOKEN_FIELDS})
+
+
+def token_is_fresh(user):
+    if not user.hemis_token:
+        return False
+    expires_at = user.hemis_token_expires_at or _jwt_expiry(user.hemis_token)
+    if expires_at is None:
+        # Muddati noma'lum (eski token) - ishlatib ko'ramiz, 401 bo'lsa yangilanadi
+        return True
+    return expires_at - timedelta(seconds=settings.HEMIS_TOKEN_REFRESH_MARGIN) > timezone.now()
+
+
+def ensure_token(user, force=False):
+    """
+    Ishlaydigan tokenni qaytaradi (kerak bo'lsa yangilab). Login xato bo'lsa - None.
+    force=True: token 401 qaytargan, muddatidan qat'i nazar yangilanadi.
+    """
+    if not force and token_is_fresh(user):
+        return user.hemis_token
+
+    stale_token = user.hemis_token
+    with _refresh_locks[user.pk % _LOCK_STRIPES]:
+        with transaction.atomic():
+            locked = User.objects.select_for_update().only(
+                'id', 'hemis_login', 'hemis_password', *TOKEN_FIELDS
+            ).get(pk=user.pk)
+
+            # Biz kutayotganimizda boshqa sync tokenni yangilab bo'lgan bo'lishi mumkin
+            refreshed_elsewhere = locked.hemis_token != stale_token and token_is_fresh(locked)
+            if not refreshed_elsewhere and (force or not token_is_fresh(locked)):
+                auth_data = get_auth_token(locked.hemis_login, locked.hemis_password)
+                if not auth_data['success']:
+                    return None
+                store_token(locked, auth_data['token'])
+
+        for f in TOKEN_FIELDS:
+            setattr(user, f, getattr(locked, f))
+    return user.hemis_token
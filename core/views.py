@@ -1,21 +1,36 @@
+import copy
+import json
+import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from datetime import datetime
-from django.db.models import Sum
+from django.db.models import Sum, Q, Count
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 from django.core.files.storage import default_storage
+from django.conf import settings
+from asgiref.sync import sync_to_async
 
 # Modellar
 from .models import (
-    User, Semester, Week, Schedule, Attendance, Task, 
+    User, Schedule, Attendance, Task, SyncJob,
     EssayTopic, Submission
 )
 
 from .services import get_auth_token
-from .sync import sync_student_data
+from .jobs import enqueue_sync
+from .tokens import store_token
+from .lookups import semesters, weeks
+from . import telegram_bot
 from chat.essay_agent import grade_essay_ai
 
+logger = logging.getLogger(__name__)
+
 # -----------------------------------------------------------------------------
 # 1. AUTHENTICATION (KIRISH/CHIQISH)
 # -----------------------------------------------------------------------------
@@ -48,7 +63,7 @@ def login_view(request):
             
             user.hemis_login = login_input
             user.hemis_password = password
-            user.hemis_token = token
+            store_token(user, token, save=False)
             if created:
                 user.role = 'student'
                 user.full_name = login_input 
@@ -56,15 +71,9 @@ def login_view(request):
             
             login(request, user)
             
-            messages.info(request, "Ma'lumotlar bazasi yangilanmoqda...")
-            try:
-                if sync_student_data(user):
-                    messages.success(request, "Xush kelibsiz! Ma'lumotlar muvaffaqiyatli yuklandi.")
-                else:
-                    messages.warning(request, "Tizimga kirildi, lekin ma'lumotlarni to'liq yuklab bo'lmadi.")
-            except Exception as e:
-                print(f"Sync Error: {e}")
-                messages.warning(request, "Ma'lumotlarni yuklashda xatolik yuz berdi.")
+            # Sinxronizatsiya fonda (sync_worker) bajariladi, login kutib qolmaydi
+            enqueue_sync(user)
+            messages.info(request, "Xush kelibsiz! Ma'lumotlar fonda yangilanmoqda...")
 
             return redirect('dashboard')
         else:
@@ -89,7 +98,8 @@ def dashboard_view(request):
         
     return render(request, 'dashboard.html', {
         'student': request.user, 
-        'group': request.user.group_name
+        'group': request.user.group_name,
+        'sync_job': SyncJob.objects.filter(user=request.user).first()
     })
 
 @login_required
@@ -100,81 +110,130 @@ def force_update_view(request):
         logout(request) 
         return redirect('login')
 
-    try:
-        success = sync_student_data(user)
-        if success:
-            messages.success(request, "Ma'lumotlar Hemis tizimidan muvaffaqiyatli yangilandi!")
-        else:
-            messages.warning(request, "Yangilashda xatolik: Hemis bilan bog'lanib bo'lmadi.")
-    except Exception as e:
-        messages.error(request, f"Tizim xatoligi: {e}")
+    enqueue_sync(user)
+    messages.info(request, "Yangilash navbatga qo'yildi. Ma'lumotlar bir necha soniyada yangilanadi.")
     
     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
 
+@login_required
+def sync_status_view(request):
+    """Dashboard shu manzilni so'rab, fondagi sync holatini kuzatadi."""
+    job = SyncJob.objects.filter(user=request.user).first()
+    if not job:
+        return JsonResponse({'status': 'none'})
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+    })
+
+ATTENDANCE_PAGE_SIZE = 30
+DAYS_ORDER = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
+
+
+class HemisPageData:
+    """
+    Hemis sahifasi uchun ma'lumotlar to'plami.
+    Har bir qism (haftalar, jadval, davomat, topshiriqlar) faqat birinchi
+    murojaatda bitta so'rov bilan olinadi va keyin qayta ishlatiladi -
+    shablon uni necha marta o'qishidan qat'i nazar so'rovlar soni o'zgarmaydi.
+    """
+
+    def __init__(self, user, semester, week_id=None, att_page=None):
+        self.user = user
+        self.semester = semester
+        self.requested_week_id = week_id
+        self.att_page = att_page
+
+    def _filter(self, model):
+        return model.objects.filter(user=self.user, semester=self.semester)
+
+    @cached_property
+    def weeks(self):
+        # order_by() - Meta.ordering DISTINCT ni buzmasligi uchun
+        week_ids = self._filter(Schedule).order_by().values_list('week_id', flat=True).distinct()
+        today = datetime.now().date()
+        result = []
+        for cached_week in sorted(weeks.get_many(week_ids).values(), key=lambda w: w.start_date):
+            # Keshdagi umumiy obyektni o'zgartirmaslik uchun nusxa olamiz
+            w = copy.copy(cached_week)
+            w.current = w.start_date <= today <= w.end_date
+            result.append(w)
+        return result
+
+    @cached_property
+    def active_week(self):
+        # So'ralgan hafta bu semestrda bo'lmasa (eski havola) - joriy yoki birinchi hafta
+        requested = next((w for w in self.weeks if w.week_id == self.requested_week_id), None)
+        return requested or next((w for w in self.weeks if w.current), None) or next(iter(self.weeks), None)
+
+    @cached_property
+    def schedule(self):
+        if not self.active_week:
+            return []
+        grouped = {day: [] for day in DAYS_ORDER}
+        lessons = self._filter(Schedule).filter(week_id=self.active_week.week_id).select_related('subject').order_by('lesson_time')
+        for s in lessons:
+            if s.day_name in grouped: grouped[s.day_name].append(s)
+        return [{'day_name': day, 'lessons': grouped[day]} for day in DAYS_ORDER if grouped[day]]
+
+    @cached_property
+    def attendance(self):
+        attendances = self._filter(Attendance)
+        # Statistika bitta so'rovda bazada hisoblanadi, ro'yxat esa sahifalab olinadi
+        totals = attendances.aggregate(
+            total=Sum('hours'),
+            sababli=Sum('hours', filter=Q(type__icontains='ababl')),
+            sababsiz=Sum('hours', filter=Q(type__icontains='ababs')),
+            count=Count('id'),
+        )
+        paginator = Paginator(attendances.select_related('subject').order_by('-date', '-id'), ATTENDANCE_PAGE_SIZE)
+        # Umumiy sonni aggregate allaqachon hisobladi - Paginator alohida COUNT yubormaydi
+        paginator.count = totals.pop('count')
+        stats = {key: value or 0 for key, value in totals.items()}
+        stats['list'] = paginator.get_page(self.att_page)
+        return stats
+
+    @cached_property
+    def tasks(self):
+        return list(self._filter(Task).select_related('subject').order_by('deadline'))
+
+
 @login_required
 def hemis_view(request):
     if request.user.is_teacher and not request.user.is_superuser:
         return redirect('teacher_dashboard')
 
     user = request.user
-    all_semesters = Semester.objects.all().order_by('-code')
+    all_semesters = sorted(semesters.all(), key=lambda s: s.code, reverse=True)
     selected_sem_id = request.GET.get('semester')
     
     current_sem = None
     if selected_sem_id:
-        current_sem = all_semesters.filter(code=selected_sem_id).first()
+        current_sem = next((s for s in all_semesters if s.code == selected_sem_id), None)
     if not current_sem:
-        current_sem = all_semesters.filter(current=True).first() or all_semesters.first()
+        current_sem = next((s for s in all_semesters if s.current), None) or next(iter(all_semesters), None)
             
     if not current_sem:
         messages.warning(request, "Semestrlar topilmadi. 'Yangilash' tugmasini bosing.")
-        return render(request, 'hemis/main.html', {'all_semesters': [], 'schedule': []})
-
-    user_schedules = Schedule.objects.filter(user=user, semester=current_sem)
-    week_ids = user_schedules.values_list('week_id', flat=True).distinct()
-    all_weeks = Week.objects.filter(week_id__in=week_ids).order_by('start_date')
-    
-    today = datetime.now().date()
-    selected_week_id = request.GET.get('week')
-    active_week = None
-    
-    weeks_display = []
-    for w in all_weeks:
-        is_current = (w.start_date <= today <= w.end_date)
-        w.current = is_current
-        weeks_display.append(w)
-        if not selected_week_id and is_current: active_week = w
-            
-    if selected_week_id: active_week = all_weeks.filter(week_id=selected_week_id).first()
-    if not active_week and all_weeks.exists(): active_week = all_weeks.first()
-
-    schedule_list = []
-    if active_week:
-        weekly_scheds = user_schedules.filter(week_id=active_week.week_id).order_by('lesson_time')
-        days_order = ["Dushanba", "Seshanba", "Chorshanba", "Payshanba", "Juma", "Shanba"]
-        grouped = {day: [] for day in days_order}
-        for s in weekly_scheds:
-            if s.day_name in grouped: grouped[s.day_name].append(s)
-        for day in days_order:
-            if grouped[day]: schedule_list.append({'day_name': day, 'lessons': grouped[day]})
-
-    attendances = Attendance.objects.filter(user=user, semester=current_sem).order_by('-date')
-    att_stats = {
-        'total': sum(a.hours for a in attendances),
-        'sababli': sum(a.hours for a in attendances if 'ababl' in a.type),
-        'sababsiz': sum(a.hours for a in attendances if 'ababs' in a.type),
-        'list': attendances
-    }
-    tasks = Task.objects.filter(user=user, semester=current_sem).order_by('deadline')
+        # Bo'sh sahifa keshlanmaydi (fragment_ttl=0)
+        return render(request, 'hemis/main.html', {'all_semesters': [], 'fragment_ttl': 0})
 
+    data = HemisPageData(user, current_sem, request.GET.get('week'), request.GET.get('att_page'))
     context = {
         'all_semesters': all_semesters,
         'selected_sem_id': current_sem.code,
-        'all_weeks': weeks_display,
-        'selected_week_id': active_week.week_id if active_week else None,
-        'schedule': schedule_list,
-        'attendance': att_stats,
-        'tasks': tasks
+        'selected_week_id': data.active_week.week_id if data.active_week else None,
+        'hemis': data,
+        # Jadval/davomat/topshiriq fragmentlari shu versiya bilan keshlanadi (shablondagi {% cache %}).
+        # Versiya bazada - sync_worker dagi o'zgarish veb-jarayonda darhol ko'rinadi
+        'hemis_version': user.hemis_data_version,
+        # Kesh kalitiga Paginator tekshirgan sahifa raqami (ixtiyoriy ?att_page= qiymatlari
+        # yangi yozuv yaratmaydi). Buning uchun davomat statistikasi so'rovi keshda ham bajariladi
+        'att_page': data.attendance['list'].number,
+        'fragment_ttl': settings.HEMIS_FRAGMENT_CACHE_TTL,
+        'sync_job': SyncJob.objects.filter(user=user).first()
     }
     return render(request, 'hemis/main.html', context)
 
@@ -206,10 +265,33 @@ def student_essay_list(request):
     })
 
 @login_required
-def essay_detail_view(request, topic_id):
+async def essay_detail_view(request, topic_id):
     """
     Yozma ish topshirish (Matn yoki Rasm) va natijani ko'rish.
+    Baza/sahifa qismi sync oqimda, AI tekshiruvi esa async kutiladi -
+    Gemini javob berguncha worker oqimi band bo'lmaydi.
     """
+    result = await sync_to_async(_essay_detail)(request, topic_id)
+    if isinstance(result, HttpResponse):
+        return result
+
+    # --- AI TEKSHIRUVI (Vision) ---
+    sub, grade_kwargs = result
+    grade, feedback = await grade_essay_ai(**grade_kwargs)
+    await sync_to_async(_save_ai_grade)(request, sub, grade, feedback)
+    return redirect('essay_detail', topic_id=topic_id)
+
+def _save_ai_grade(request, sub, grade, feedback):
+    # Natijani yangilash
+    sub.ai_grade = grade
+    sub.ai_feedback = feedback
+    sub.status = 'ai_graded' # AI baholadi, talaba natijani ko'radi va xohlasa qayta topshiradi
+    sub.save()
+    
+    messages.success(request, f"Ishingiz qabul qilindi! AI Bahosi: {grade}")
+
+def _essay_detail(request, topic_id):
+    """Sahifa javobini yoki AI tekshiruvi kerak bo'lsa (submission, grade_essay_ai argumentlari) ni qaytaradi."""
     topic = get_object_or_404(EssayTopic, id=topic_id)
     submission = Submission.objects.filter(user=request.user, topic=topic).first()
     
@@ -252,27 +334,17 @@ def essay_detail_view(request, topic_id):
             
             sub.save()
             
-            # --- AI TEKSHIRUVI (Vision) ---
+            # --- AI TEKSHIRUVI (Vision) uchun argumentlar ---
             topic_file_path = topic.topic_file.path if topic.topic_file else None
             student_file_path = sub.file.path if sub.file else None
             
-            # Agentni chaqiramiz
-            grade, feedback = grade_essay_ai(
+            return sub, dict(
                 topic_title=topic.title, 
                 topic_desc=topic.description, 
                 topic_file_path=topic_file_path,
                 student_text=text_content, 
                 student_file_path=student_file_path 
             )
-            
-            # Natijani yangilash
-            sub.ai_grade = grade
-            sub.ai_feedback = feedback
-            sub.status = 'ai_graded' # AI baholadi, talaba natijani ko'radi va xohlasa qayta topshiradi
-            sub.save()
-            
-            messages.success(request, f"Ishingiz qabul qilindi! AI Bahosi: {grade}")
-            return redirect('essay_detail', topic_id=topic.id)
 
     # 2. Appellatsiya berish (POST)
     if request.method == 'POST' and 'appeal' in request.POST:
@@ -413,4 +485,40 @@ def mock_exam_view(request):
     return render(request, 'education/exams.html', {'active_tab': 'exams'})
 
 def ai_assessment_view(request):
-    return render(request, 'education/assessment.html', {'active_tab': 'assessment'})
\ No newline at end of file
+    return render(request, 'education/assessment.html', {'active_tab': 'assessment'})
+
+
+# -----------------------------------------------------------------------------
+# 6. TELEGRAM WEBHOOK
+# -----------------------------------------------------------------------------
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """
+    Telegram yangilanishlarini qabul qiladi (TELEGRAM_WEBHOOK_URL berilganda).
+    Sir token tekshiriladi; bir update_id faqat bir marta qayta ishlanadi.
+    """
+    if not telegram_bot.webhook_secret():
+        return HttpResponseNotFound()
+    if not telegram_bot.verify_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        return HttpResponseForbidden()
+
+    try:
+        data = json.loads(request.body)
+        update_id = int(data['update_id'])
+    except (ValueError, TypeError, KeyError):
+        return HttpResponse(status=400)
+
+    # Telegram qayta yuborgan yangilanish - allaqachon qayta ishlangan
+    if not await sync_to_async(telegram_bot.claim_update)(update_id):
+        return HttpResponse()
+
+    try:
+        await sync_to_async(telegram_bot.process_update)(data)
+    except Exception:
+        logger.exception(f"Telegram webhook xatosi (update_id={update_id})")
+        await sync_to_async(telegram_bot.release_update)(update_id)
+        # 200 bo'lmagan javob - Telegram yangilanishni keyinroq qayta yuboradi
+        return HttpResponse(status=500)
+    return HttpResponse()
\ No newline at end of file
@@ -1,33 +1,19 @@
-import os
-import google.generativeai as genai
 import json
 import re
 
-# API kalitni olish (.env faylidan)
-API_KEY = os.getenv('GEMINI_KEY_EXAM') or os.getenv('GEMINI_KEY_STUDENT')
+# Kalit (GEMINI_KEY_EXAM yoki GEMINI_KEY_STUDENT) va klientlar markaziy reestrdan
+from chat.ai import get_model, AGENT_EXAM
 
-def configure_genai():
-    """Gemini API ni sozlash"""
-    if not API_KEY:
-        return False
-    try:
-        # Stable API versiyasini ko'rsatamiz
-        genai.configure(api_key=API_KEY)
-        return True
-    except Exception as e:
-        print(f"❌ API Config Error: {e}")
-        return False
-
-def grade_writing_full_exam(t1_prompt, t1_resp, t2_prompt, t2_resp):
+async def grade_writing_full_exam(t1_prompt, t1_resp, t2_prompt, t2_resp):
     """
     Qat'iy IELTS standartlari asosida Writing tahlili.
     Model nomi xatoliklarni oldini olish uchun prefiksiz ishlatiladi.
+    Async: Gemini javobini kutish paytida worker oqimi band bo'lmaydi.
     """
-    if not configure_genai():
-        return 0, "Texnik xatolik: API kalit sozlanmagan."
-    
     # MUHIM: Model nomi shunchaki 'gemini-1.5-flash' bo'lishi kerak
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    model = get_model(AGENT_EXAM, 'gemini-1.5-flash')
+    if model is None:
+        return 0, "Texnik xatolik: API kalit sozlanmagan."
     
     # Kuchli prompt (Strict IELTS Examiner)
     prompt = f"""
@@ -55,7 +41,7 @@ def grade_writing_full_exam(t1_prompt, t1_resp, t2_prompt, t2_resp):
     
     try:
         # Sun'iy intellektga yuborish
-        response = model.generate_content(prompt)
+        response = await model.generate_content_async(prompt)
         text_data = response.text.strip()
         
         # JSONni Markdown bloklaridan tozalab olish (Xavfsiz tahlil)
@@ -70,8 +56,8 @@ def grade_writing_full_exam(t1_prompt, t1_resp, t2_prompt, t2_resp):
         print(f"🚨 Writing AI Error: {str(e)}")
         # Zaxira sifatida muqobil modelni sinab ko'rish
         try:
-            fallback_model = genai.GenerativeModel('gemini-pro')
-            res = fallback_model.generate_content(prompt)
+            fallback_model = get_model(AGENT_EXAM, 'gemini-pro')
+            res = await fallback_model.generate_content_async(prompt)
             match = re.search(r'\{.*\}', res.text, re.DOTALL)
             if match:
                 d = json.loads(match.group())
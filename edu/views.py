@@ -3,6 +3,8 @@
 import random
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.utils import timezone
 from .models import Section, SectionResult, StudentResult
@@ -35,7 +37,28 @@ def start_random_exam(request):
     return redirect('take_section', result_id=result.id, section_id=first_section.id)
 
 @login_required
-def take_section_view(request, result_id, section_id):
+async def take_section_view(request, result_id, section_id):
+    """
+    Imtihon bo'limi. Writing javobi AI tomonidan async baholanadi -
+    Gemini javob berguncha worker oqimi band bo'lmaydi; qolgan qism sync oqimda.
+    """
+    outcome = await sync_to_async(_take_section)(request, result_id, section_id)
+    if isinstance(outcome, HttpResponse):
+        return outcome
+
+    result, section, sec_res, writing_args = outcome
+    try:
+        grade, feedback = await grade_writing_full_exam(*writing_args)
+        sec_res.score = grade
+        sec_res.ai_feedback = feedback
+    except Exception as e:
+        sec_res.score = 0
+        sec_res.ai_feedback = f"Xatolik: {str(e)}"
+    await sync_to_async(sec_res.save)()
+    return await sync_to_async(_next_section_redirect)(result, section)
+
+def _take_section(request, result_id, section_id):
+    """Sahifa javobini yoki writing bo'lsa (result, section, sec_res, AI argumentlari) ni qaytaradi."""
     result = get_object_or_404(StudentResult, id=result_id, user=request.user)
     section = get_object_or_404(Section, id=section_id)
     
@@ -74,34 +97,12 @@ def take_section_view(request, result_id, section_id):
             sec_res.writing_task2_response = task2_text
             sec_res.save()
             
-            try:
-                grade, feedback = grade_writing_full_exam(
-                    section.writing_task1_content, task1_text,
-                    section.writing_task2_content, task2_text
-                )
-                sec_res.score = grade
-                sec_res.ai_feedback = feedback
-            except Exception as e:
-                sec_res.score = 0
-                sec_res.ai_feedback = f"Xatolik: {str(e)}"
-            sec_res.save()
+            return result, section, sec_res, (
+                section.writing_task1_content, task1_text,
+                section.writing_task2_content, task2_text
+            )
 
-        # Keyingi bo'limga o'tish
-        all_results = result.section_results.all().order_by('section__order')
-        next_sec = None
-        found = False
-        for sr in all_results:
-            if found:
-                next_sec = sr.section
-                break
-            if sr.section.id == section.id:
-                found = True
-        
-        if next_sec:
-            return redirect('take_section', result_id=result.id, section_id=next_sec.id)
-        else:
-            finish_exam(result)
-            return redirect('exam_result', result_id=result.id)
+        return _next_section_redirect(result, section)
 
     # --- INPUTLARNI O'ZGARTIRISH LOGIKASI ---
     # 1. Asosiy matnni o'zgartirish
@@ -120,6 +121,24 @@ def take_section_view(request, result_id, section_id):
         'displayed_content': final_content
     })
 
+def _next_section_redirect(result, section):
+    # Keyingi bo'limga o'tish
+    all_results = result.section_results.all().order_by('section__order')
+    next_sec = None
+    found = False
+    for sr in all_results:
+        if found:
+            next_sec = sr.section
+            break
+        if sr.section.id == section.id:
+            found = True
+
+    if next_sec:
+        return redirect('take_section', result_id=result.id, section_id=next_sec.id)
+    else:
+        finish_exam(result)
+        return redirect('exam_result', result_id=result.id)
+
 def finish_exam(result):
     results = result.section_results.all()
     if results.exists():